@@ -43,6 +43,9 @@ build_exe() {
     echo "Copying selenium-stealth files..."
     cp -r venv/Lib/site-packages/selenium_stealth output/parser_bot/selenium_stealth
 
+    echo "Copying sources.toml..."
+    cp sources.toml output/parser_bot/sources.toml
+
     echo "Build completed."
 }
 
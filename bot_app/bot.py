@@ -6,90 +6,297 @@ from typing import List
 
 import telebot
 from telebot import formatting
-from dotenv import load_dotenv, set_key
+from dotenv import find_dotenv, load_dotenv
 
+from bot_app.dedup import near_duplicates
+from bot_app.dispatcher import OutboundDispatcher, OutboundMessage
+from bot_app.exceptions import ConfigError
 from bot_app.log import logger
+from bot_app.metrics import news_items, registry, stage, summary
+from bot_app.outbox import DROPPED, OutboxEntry, outbox
 from bot_app.parsers import AbstractParser
-from bot_app.scraping.parsers import InvestingParserSelenium
-# from bot_app.parsers import RBCParser
-from bot_app.consts import PERIOD
-
-
-load_dotenv()
-
-for env_var_name in ['TOKEN', 'CHANNEL_ID']:
-    if not os.getenv(env_var_name):
-        value = input(f'Введите {env_var_name}: ')
-        os.environ.setdefault(env_var_name, value)
-        set_key('.env', env_var_name, value)
-
-TOKEN = os.getenv('TOKEN')  # Ваш токен
-CHANNEL_ID = os.getenv('CHANNEL_ID')    # Ваш логин канала
+from bot_app.profiling import profiler
+from bot_app.consts import (
+    DEFAULT_PARSERS,
+    PERIOD,
+    SHARD_ADDRESS,
+    SHARD_PARSERS,
+    SHARD_WORKERS,
+    SOURCES_PATH,
+    TELEGRAM_MAX_MESSAGE_LENGTH
+)
+from bot_app.scheduler import Scheduler
+from bot_app.storage import seen_store
 
 
 class NewsParser:
-    def __init__(self, parsers: List[AbstractParser]):
+    def __init__(
+        self, parsers: List[AbstractParser], dispatcher: OutboundDispatcher, chat_id
+    ):
         self.thread: threading.Thread = None
         self.start_ts = None
         self.parsers = parsers
+        self.dispatcher = dispatcher
+        self.chat_id = chat_id
+        # новости, отданные диспетчеру и ещё не доставленные
+        self.inflight = set()
+        self.scheduler: Scheduler = None
+        self.stop_event = threading.Event()
+        self.register_metrics()
+
+    def register_metrics(self):
+        registry.callback(
+            'news_queue_depth',
+            'Новости в очереди парсера на отправку',
+            lambda: [
+                ({'source': parser.__name__}, len(parser.deque))
+                for parser in self.parsers
+            ]
+        )
+        registry.callback(
+            'news_inflight',
+            'Новости, переданные диспетчеру и ещё не доставленные',
+            lambda: [({}, len(self.inflight))]
+        )
+        registry.callback(
+            'dispatcher_pending',
+            'Сообщения в очереди диспетчера отправки',
+            lambda: [({}, self.dispatcher.pending())]
+        )
 
-    def parse_news(self, delay: int):
-        logger.info("Delaying parse_news for {}".format(delay))
-        time.sleep(delay)
-        while self.is_running:
+    def parse_news(self, delay: int, stop_event: threading.Event, previous: Scheduler = None):
+        logger.info('Delaying parse_news for %s', delay)
+        if previous is not None:
+            # задачи прошлого запуска ещё могут работать с теми же парсерами
+            previous.join()
+        if stop_event.wait(delay):
+            return
+        # обычно уже запущен в App.start, здесь - для NewsParser без App
+        self.dispatcher.start()
+        try:
+            self.resume_outbox()
             for parser in self.parsers:
-                parser.get_last_news_object()
-
-                if not parser.deque:
-                    logger.info('No news object, skipping cycle')
-                    continue
-
-                copied_deque = parser.deque.copy()
-                news_object: dict = copied_deque.popleft()
-                if not news_object:
-                    logger.info('news object пустой, скип')
-                    continue
-
-                raw_text = parser.get_article_text_selenium(news_object['link'])
-                if not raw_text:
-                    logger.error('Пустой текст статьи с {}'.format(news_object['link']))
-                    continue
+                parser.warm_up()
+
+            for parser in self.parsers:
+                # без /profile profiler.run просто вызывает process_source
+                self.scheduler.add_job(
+                    parser.__name__,
+                    profiler.run,
+                    parser.poll_interval,
+                    args=(parser.__name__, self.process_source, parser, stop_event),
+                    max_concurrency=parser.max_concurrency
+                )
+            self.scheduler.run()
+        finally:
+            # занятые браузеры закроются, когда их вернут в пул
+            for parser in self.parsers:
+                parser.shutdown()
+            # диспетчер не останавливаем: подготовленные новости
+            # досылаются и после /stop, а остальные ждут в outbox
+            logger.info('parse_news stopped')
+
+    def process_source(self, parser: AbstractParser, stop_event: threading.Event = None):
+        stop_event = stop_event or self.stop_event
+        parser.get_last_news_object()
+
+        if not parser.deque:
+            logger.info('No news object, skipping cycle')
+            return
+
+        # ставим в очередь отправки в порядке публикации; новости, которые
+        # уже ждут отправки, пропускаем
+        for news_object in list(parser.deque):
+            if stop_event.is_set():
+                break
+            if (parser.__name__, str(news_object.get('id'))) in self.inflight:
+                continue
+            if (
+                news_object not in parser.deque
+                or parser.seen.contains(parser.__name__, news_object.get('id'))
+            ):
+                # доставлена, пока готовились новости перед ней в снимке очереди
+                continue
+            if self.drop_near_duplicate(parser, news_object):
+                continue
+            key = (parser.__name__, str(news_object.get('id')))
+            try:
+                self.post_news(parser, news_object)
+            finally:
+                if key not in self.inflight:
+                    # не дошла до диспетчера, копии с других источников не ждут её
+                    near_duplicates.release(key)
+
+    def drop_near_duplicate(self, parser: AbstractParser, news_object: dict) -> bool:
+        """
+        Та же новость, уже отправленная с другого источника, не рендерится
+        и не отправляется, а отмечается опубликованной. Если та ещё
+        отправляется, новость ждёт следующего цикла: отправка может
+        не удаться.
+        """
+        if not news_object:
+            return False
+        with stage('dedup_check', parser.__name__):
+            found = near_duplicates.check(
+                (parser.__name__, str(news_object.get('id'))),
+                news_object.get('title'),
+                news_object.get('lead')
+            )
+        if found is None:
+            return False
+        match, sent = found
+        if not sent:
+            logger.info(
+                'Deferring %s from %s: %s from %s is being sent',
+                news_object.get('id'), parser.__name__, match[1], match[0]
+            )
+            return True
+        logger.info(
+            'Skipping %s from %s: near duplicate of %s from %s',
+            news_object.get('id'), parser.__name__, match[1], match[0]
+        )
+        if news_object in parser.deque:
+            parser.deque.remove(news_object)
+        parser.store_last_news_item_id(news_object.get('id'))
+        if outbox.get(parser.__name__, news_object.get('id')) is not None:
+            outbox.done(parser.__name__, news_object.get('id'), state=DROPPED)
+        news_items.inc(source=parser.__name__, event='duplicate')
+        return True
+
+    def post_news(self, parser: AbstractParser, news_object: dict):
+        """Готовит текст новости и передаёт его диспетчеру отправки."""
+        if not news_object:
+            logger.info('news object пустой, скип')
+            parser.deque.remove(news_object)
+            return
+
+        # текст, подготовленный в прошлый раз, берём из очереди на диске
+        entry = outbox.get(parser.__name__, news_object.get('id'))
+        if entry is None:
+            raw_text = parser.get_article(news_object['link'])
+            if not raw_text:
+                logger.error('Пустой текст статьи с %s', news_object['link'])
+                return
+            with stage('markdown_escape', parser.__name__):
                 article_text = formatting.escape_markdown(raw_text)
 
-                if parser.deque:
-                    try:
-                        # сначала пытаемся запостить новость из очереди парсера
-                        text = (
-                            f'*{formatting.escape_markdown(news_object.get("title"))}*\n\n'
-                            f'{article_text}\n'
-                            f'[Читать продолжение в источнике]({news_object.get("link")})'
-                        )
-                        bot.send_message(
-                            chat_id=CHANNEL_ID,
-                            text=text,
-                            parse_mode='MarkdownV2'
-                        )
-
-                        # если получилось, забираем её из очереди на постинг
-                        parser.deque.popleft()
-                        parser.store_last_news_item_id(news_object.get('id'))
-                    except Exception as e:
-                        logger.error('Exception on sending msg to channel: {}'.format(e))
-            time.sleep(PERIOD)
+                text = (
+                    f'*{formatting.escape_markdown(news_object.get("title"))}*\n\n'
+                    f'{article_text}\n'
+                    f'[Читать продолжение в источнике]({news_object.get("link")})'
+                )
+            entry = outbox.add(
+                parser.__name__, news_object.get('id'), self.chat_id, news_object,
+                text, parse_mode='MarkdownV2'
+            )
+        self.submit(entry, parser)
+
+    def submit(self, entry: OutboxEntry, parser: AbstractParser = None):
+        """Передаёт запись очереди на диске диспетчеру отправки."""
+        self.inflight.add(entry.key)
+        self.dispatcher.submit(
+            OutboundMessage(
+                chat_id=entry.chat_id,
+                text=entry.text,
+                parse_mode=entry.parse_mode,
+                on_success=lambda: self.on_delivered(parser, entry),
+                on_failure=lambda e: self.on_failed(parser, entry),
+                source=entry.source
+            )
+        )
+
+    def resume_outbox(self):
+        """
+        Отправляет новости, подготовленные до остановки или падения:
+        текст уже готов, поэтому ни источник, ни браузер не нужны.
+        """
+        parsers = {parser.__name__: parser for parser in self.parsers}
+        for entry in outbox.pending():
+            if entry.key in self.inflight:
+                continue
+            if seen_store.contains(*entry.key):
+                # доставлена, но процесс упал до записи об этом
+                outbox.done(*entry.key)
+                continue
+            found = near_duplicates.check(
+                entry.key, entry.item.get('title'), entry.item.get('lead')
+            )
+            if found is not None:
+                if found[1]:
+                    seen_store.add(*entry.key)
+                    outbox.done(*entry.key, state=DROPPED)
+                # иначе копия ещё отправляется, новость подождёт парсера
+                continue
+            logger.info('Resuming %s from %s', entry.news_id, entry.source)
+            self.submit(entry, parsers.get(entry.source))
+
+    def on_delivered(self, parser: AbstractParser, entry: OutboxEntry):
+        # если получилось, забираем её из очереди на постинг
+        if parser is not None:
+            for news_object in list(parser.deque):
+                if str(news_object.get('id')) == entry.news_id:
+                    parser.deque.remove(news_object)
+            parser.store_last_news_item_id(entry.news_id)
+            parser.record_published(entry.news_id)
+        else:
+            seen_store.add(entry.source, entry.news_id)
+        near_duplicates.register(entry.key, entry.item.get('title'), entry.item.get('lead'))
+        outbox.done(*entry.key)
+        self.inflight.discard(entry.key)
+        news_items.inc(source=entry.source, event='posted')
+
+    def on_failed(self, parser: AbstractParser, entry: OutboxEntry):
+        # новость остаётся в очереди парсера и на диске до следующего цикла
+        near_duplicates.release(entry.key)
+        self.inflight.discard(entry.key)
+        news_items.inc(source=entry.source, event='failed')
+
+    def sources(self) -> list:
+        return [(parser.__name__, parser.URL) for parser in self.parsers]
 
     def is_running(self):
-        return self.thread is not None and self.thread.is_alive()
+        return (
+            self.thread is not None and self.thread.is_alive()
+            and not self.stop_event.is_set()
+        )
+
+    def is_stopping(self):
+        """После /stop поток ещё доделывает работу и новый запуск невозможен."""
+        return (
+            self.thread is not None and self.thread.is_alive()
+            and self.stop_event.is_set()
+        )
 
     def start_thread(self, delay):
         if not self.thread or not self.thread.is_alive():
-            self.thread = threading.Thread(target=self.parse_news, args=(delay,))
+            # у каждого запуска своё событие остановки: задачи прошлого
+            # запуска, ещё не доработавшие после /stop, его не увидят сброшенным
+            self.stop_event = threading.Event()
+            previous, self.scheduler = self.scheduler, Scheduler()
+            self.thread = threading.Thread(
+                target=self.parse_news, args=(delay, self.stop_event, previous)
+            )
             self.thread.start()
             self.start_ts = time.monotonic()
 
-    def stop_thread(self):
-        # not working. Need event to handle thread stopping
+    def stop_thread(self, timeout=1, force=False):
+        """
+        Останавливает планировщик и ждёт поток не дольше `timeout` секунд.
+        С `force` браузеры закрываются сразу, не дожидаясь текущих запросов.
+        """
+        self.stop_event.set()
+        if self.scheduler:
+            self.scheduler.stop()
+        if force:
+            for parser in self.parsers:
+                parser.shutdown(force=True)
         if self.thread and self.thread.is_alive():
-            self.thread.join()
+            self.thread.join(timeout)
+
+    def poll_now(self):
+        """Будит планировщик и опрашивает все источники немедленно."""
+        if self.scheduler:
+            self.scheduler.wake(run_now=True)
 
     def delay(self):
         delay = 0
@@ -101,68 +308,161 @@ class NewsParser:
         return delay
 
 
-bot = telebot.TeleBot(TOKEN)
-# rbc_parser = RBCParser()
-investing_parser = InvestingParserSelenium()
-news_parser_thread = NewsParser(
-    [
-        investing_parser,
-        # rbc_parser
-    ]
-)
+class App:
+    """Бот, диспетчер отправки и парсеры одного запуска."""
 
+    def __init__(self, bot: telebot.TeleBot, dispatcher: OutboundDispatcher, news_parser_thread):
+        self.bot = bot
+        self.dispatcher = dispatcher
+        self.news_parser_thread = news_parser_thread
+        bot.register_message_handler(self.commands, content_types=['text'])
 
-@bot.message_handler(content_types=['text'])
-def commands(message):
-    status_msg = ''
+    def start(self):
+        """
+        Запускает отправку и досылает новости, подготовленные до остановки
+        или падения, не дожидаясь /start.
+        """
+        self.dispatcher.start()
+        self.news_parser_thread.resume_outbox()
 
-    if message.text == "/stop":
-        if not news_parser_thread.is_running():
-            status_msg += "Ошибка: парсинг не запущен."
-        else:
-            news_parser_thread.stop_thread()
-            status_msg += "Остановка парсинга"
-        bot.send_message(message.from_user.id, status_msg)
-    elif message.text == "/start":
-        delay = 0
+    def stop(self):
+        """Останавливает парсинг и отправку; неотправленное остаётся в outbox."""
+        self.news_parser_thread.stop_thread(force=True)
+        self.dispatcher.stop()
 
-        if news_parser_thread.is_running():
-            status_msg += 'Ошибка: парсинг уже запущен'
-        else:
-            delay = news_parser_thread.delay()
-            if delay > 0:
-                status_msg += (
-                    f'Старт парсинга отложен на {round(delay)} секунд, '
-                    'т.к. он уже был запущен ранее.'
+    def commands(self, message):
+        status_msg = ''
+
+        if message.text == "/stop":
+            if not self.news_parser_thread.is_running():
+                status_msg += "Ошибка: парсинг не запущен."
+            else:
+                self.news_parser_thread.stop_thread()
+                status_msg += "Остановка парсинга"
+            self.bot.send_message(message.from_user.id, status_msg)
+        elif message.text == "/start":
+            delay = 0
+
+            if self.news_parser_thread.is_running():
+                status_msg += 'Ошибка: парсинг уже запущен'
+            elif self.news_parser_thread.is_stopping():
+                status_msg += 'Ошибка: парсинг ещё останавливается, повторите /start позже'
+            else:
+                delay = self.news_parser_thread.delay()
+                if delay > 0:
+                    status_msg += (
+                        f'Старт парсинга отложен на {round(delay)} секунд, '
+                        'т.к. он уже был запущен ранее.'
+                    )
+                else:
+                    status_msg += 'Парсинг запущен'
+                self.news_parser_thread.start_thread(delay)
+            self.bot.send_message(message.from_user.id, status_msg)
+        elif message.text == "/poll_now":
+            if self.news_parser_thread.is_running():
+                self.news_parser_thread.poll_now()
+                status_msg += 'Опрашиваю источники'
+            else:
+                status_msg += "Ошибка: парсинг не запущен."
+            self.bot.send_message(message.from_user.id, status_msg)
+        elif message.text.startswith("/profile"):
+            # /profile [N] [источник]
+            args = message.text.split()[1:]
+            cycles = int(args[0]) if args and args[0].isdigit() else 1
+            source = args[-1] if args and not args[-1].isdigit() else None
+            profiler.arm(cycles, source)
+            status_msg += (
+                f'Профилирую {cycles} следующих циклов '
+                f'{source or "всех источников"}, результаты в {profiler.directory}/. '
+                'Запустить цикл сразу: /poll_now'
+            )
+            self.bot.send_message(message.from_user.id, status_msg)
+        elif message.text == "/news_sources":
+            news_parser_threads_info = '\n'.join(
+                [f'{name}: {url}' for name, url in self.news_parser_thread.sources()]
+            )
+            self.bot.send_message(
+                message.from_user.id,
+                f'Текущие источники новостей:\n{news_parser_threads_info}'
+            )
+        elif message.text == '/status':
+            if self.news_parser_thread.is_running():
+                ts = time.monotonic() - self.news_parser_thread.start_ts
+                time_str = '{}min {}sec'.format(int(ts // 60), int(ts % 60))
+                header = "Парсинг запущен {}  назад.\n\n".format(time_str)
+                self.bot.send_message(
+                    message.from_user.id,
+                    header + summary(limit=TELEGRAM_MAX_MESSAGE_LENGTH - len(header))
                 )
             else:
-                status_msg += 'Парсинг запущен'
-            news_parser_thread.start_thread(delay)
-        bot.send_message(message.from_user.id, status_msg)
-    elif message.text == "/news_sources":
-        news_parser_threads_info = '\n'.join(
-            [f'{x.__name__}: {x.URL}' for x in news_parser_thread.parsers]
-        )
-        bot.send_message(
-            message.from_user.id,
-            f'Текущие источники новостей:\n{news_parser_threads_info}'
-        )
-    elif message.text == '/status':
-        if news_parser_thread.is_running():
-            ts = time.monotonic() - news_parser_thread.start_ts
-            time_str = '{}min {}sec'.format(int(ts // 60), int(ts % 60))
-            bot.send_message(
+                self.bot.send_message(message.from_user.id, "Парсинг остановлен.")
+        elif message.text == '/help':
+            self.bot.send_message(
                 message.from_user.id,
-                "Парсинг запущен {}  назад.".format(time_str)
+                "cmds: /start, /stop, /poll_now, /status, /news_sources, /profile [N] [source]"
             )
         else:
-            bot.send_message(message.from_user.id, "Парсинг остановлен.")
-    elif message.text == '/help':
-        bot.send_message(
-            message.from_user.id,
-            "cmds: /start, /stop, /status, /news_sources"
+            self.bot.send_message(
+                message.from_user.id, "Я тебя не понимаю. Напиши '/help'."
+            )
+
+
+def create_parsers(paths=DEFAULT_PARSERS) -> list:
+    """
+    Парсеры по путям импорта и включённые источники из sources.toml.
+    Модули парсеров импортируются здесь, а Selenium - только когда
+    источнику впервые понадобится браузер.
+    """
+    from bot_app.sharding import load_parser
+
+    parsers = [load_parser(path)() for path in paths]
+    if os.path.exists(SOURCES_PATH):
+        from bot_app.sources import enabled_parsers
+        parsers.extend(enabled_parsers())
+    return parsers
+
+
+def find_env_file() -> str:
+    """
+    bot_app/.env, который пишет ./app.sh set-env, а если его нет -
+    ближайший .env от текущего каталога вверх; '' если не нашлось.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')
+    if os.path.exists(path):
+        return path
+    return find_dotenv(usecwd=True)
+
+
+def create_app(token=None, chat_id=None, parsers=None, env_path=None) -> App:
+    """
+    Собирает приложение. TOKEN и CHANNEL_ID берутся из аргументов,
+    окружения или .env; если их нет - ConfigError, без запросов с консоли.
+    """
+    env_path = env_path or find_env_file()
+    load_dotenv(env_path)
+    token = token or os.getenv('TOKEN')  # Ваш токен
+    chat_id = chat_id or os.getenv('CHANNEL_ID')    # Ваш логин канала
+    missing = [
+        name for name, value in (('TOKEN', token), ('CHANNEL_ID', chat_id))
+        if not value
+    ]
+    if missing:
+        raise ConfigError(
+            'Не заданы {}: укажите их в окружении или в {} '
+            '(./app.sh set-env)'.format(', '.join(missing), env_path or 'bot_app/.env')
+        )
+
+    bot = telebot.TeleBot(token)
+    dispatcher = OutboundDispatcher(bot.send_message)
+    if SHARD_WORKERS and parsers is None:
+        from bot_app.sharding import ShardedNewsParser
+
+        # источники опрашиваются в процессах-воркерах, здесь - только отправка
+        news_parser_thread = ShardedNewsParser(
+            SHARD_PARSERS, SHARD_WORKERS, dispatcher, chat_id, address=SHARD_ADDRESS
         )
     else:
-        bot.send_message(
-            message.from_user.id, "Я тебя не понимаю. Напиши '/help'."
+        news_parser_thread = NewsParser(
+            create_parsers() if parsers is None else parsers, dispatcher, chat_id
         )
+    return App(bot, dispatcher, news_parser_thread)
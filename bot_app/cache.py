@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from bot_app.consts import ARTICLE_CACHE_PATH, ARTICLE_CACHE_SIZE, ARTICLE_CACHE_TTL
+from bot_app.log import logger
+from bot_app.metrics import registry
+
+
+def canonical_url(url: str) -> str:
+    """URL без фрагмента и utm-меток, с хостом в нижнем регистре."""
+    parts = urlsplit(url.strip())
+    query = urlencode(
+        [(k, v) for k, v in parse_qsl(parts.query) if not k.startswith('utm_')]
+    )
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), path, query, '')
+    )
+
+
+class TTLCache:
+    """
+    Ограниченный кеш с временем жизни записей и вытеснением LRU.
+
+    Если задан `path`, содержимое сохраняется на диск при каждой записи
+    и подгружается при создании, поэтому переживает перезапуск.
+    """
+
+    def __init__(self, maxsize, ttl, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                entries = json.load(file)
+        except (OSError, ValueError):
+            return
+        now = time.time()
+        for key, (ts, value) in entries:
+            if now - ts < self.ttl:
+                self._data[key] = (ts, value)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{self.path}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(list(self._data.items()), file, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning('Cant save cache to %s: %s', self.path, e)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or time.time() - entry[0] >= self.ttl:
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.time(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+article_cache = TTLCache(
+    ARTICLE_CACHE_SIZE, ARTICLE_CACHE_TTL, path=ARTICLE_CACHE_PATH
+)
+registry.callback(
+    'article_cache_requests_total',
+    'Обращения к кешу текстов статей',
+    lambda: [
+        ({'result': 'hit'}, article_cache.hits),
+        ({'result': 'miss'}, article_cache.misses)
+    ],
+    type='counter'
+)
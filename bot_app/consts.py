@@ -1,2 +1,139 @@
+import os
+
 PARSER_NEWS_ID_DIR = 'news_sources'
 PERIOD = 900
+
+# Пул драйверов Selenium
+DRIVER_POOL_SIZE = 2
+DRIVER_MAX_USES = 50
+DRIVER_MAX_AGE = 60 * 60
+DRIVER_CHECKOUT_TIMEOUT = 120
+
+# HTTP-клиент
+FETCH_MAX_CONNECTIONS = 20
+FETCH_PER_HOST_LIMIT = 4
+FETCH_TIMEOUT = 30
+
+# Хранилище опубликованных ID
+SEEN_DB_PATH = f'{PARSER_NEWS_ID_DIR}/seen.sqlite3'
+SEEN_TTL = 30 * 24 * 60 * 60
+SEEN_CACHE_SIZE = 10_000
+SEEN_BLOOM_CAPACITY = 100_000
+SEEN_COMPACT_PERIOD = 24 * 60 * 60
+
+# Очередь готовых к отправке новостей на диске: записи копятся в памяти
+# и фиксируются одной транзакцией (одним fsync) раз в OUTBOX_FLUSH_INTERVAL
+# секунд или при OUTBOX_BATCH_SIZE записях
+OUTBOX_DB_PATH = f'{PARSER_NEWS_ID_DIR}/outbox.sqlite3'
+OUTBOX_FLUSH_INTERVAL = 0.2
+OUTBOX_BATCH_SIZE = 100
+# отправленные записи хранятся столько секунд, потом удаляются
+OUTBOX_RETENTION = 24 * 60 * 60
+OUTBOX_COMPACT_PERIOD = 60 * 60
+
+# Планировщик источников
+SCHEDULER_WORKERS = 4
+SCHEDULER_JITTER = 0.1
+
+# Адаптивный интервал опроса
+POLL_MIN_PERIOD = 60
+POLL_MAX_PERIOD = PERIOD
+POLL_BACKOFF = 1.5
+POLL_RATE_WINDOW = 6 * 60 * 60
+POLLS_PER_ITEM = 2
+
+# Отправка в Telegram
+DISPATCH_GLOBAL_RATE = 30
+DISPATCH_GLOBAL_BURST = 30
+DISPATCH_CHAT_RATE = 20 / 60
+DISPATCH_CHAT_BURST = 3
+DISPATCH_MAX_ATTEMPTS = 5
+DISPATCH_BACKOFF_BASE = 2
+DISPATCH_BACKOFF_MAX = 300
+
+# Кеш текстов статей
+ARTICLE_CACHE_SIZE = 256
+ARTICLE_CACHE_TTL = 6 * 60 * 60
+ARTICLE_CACHE_PATH = f'{PARSER_NEWS_ID_DIR}/article_cache.json'
+
+# Поиск одной и той же новости с разных источников по SimHash заголовка
+# и лида: похожими считаются подписи, различающиеся не больше чем
+# в DEDUP_DISTANCE битах из 64, если числа и имена в заголовках не
+# противоречат друг другу; новости без лида совпадают только по словам.
+# Встроенные InvestingParser и RBCParser лида не отдают, поэтому их
+# новости сравниваются только так; SimHash работает для источников из
+# sources.toml с lead/lead_field. Индекс помнит новости за DEDUP_WINDOW секунд
+DEDUP_DISTANCE = 8
+DEDUP_WINDOW = 12 * 60 * 60
+DEDUP_CAPACITY = 10_000
+# символов от начала слова, остальное - окончания
+DEDUP_STEM_LENGTH = 5
+DEDUP_NUMBER_WEIGHT = 3
+
+# Облегчённый рендер страниц в Chrome
+# источники (по имени), которые рендерятся облегчённо; в sources.toml
+# вместо этого можно указать `lean = true` у записи источника
+LEAN_RENDER_SOURCES = []
+LEAN_BLOCKED_URLS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.webm',
+    '*googletagmanager.com*', '*google-analytics.com*',
+    '*doubleclick.net*', '*googlesyndication.com*', '*adservice.google*',
+    '*mc.yandex.ru*', '*facebook.net*', '*hotjar.com*', '*criteo*',
+    '*taboola.com*', '*outbrain.com*',
+]
+
+# Многоуровневая загрузка: HTTP, затем браузер
+TIER_COOLDOWN = 60 * 60
+BROWSER_HEADERS = {
+    'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
+    'accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'accept-language': 'ru-RU,ru;q=0.9,en-US;q=0.8,en;q=0.7',
+}
+
+# Метрики в формате Prometheus
+METRICS_HOST = '127.0.0.1'
+METRICS_PORT = 9108
+METRICS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120
+)
+
+# Длина сообщения Telegram, до неё обрезается сводка /status
+TELEGRAM_MAX_MESSAGE_LENGTH = 4096
+
+# Профилирование циклов опроса по /profile или SIGUSR1
+PROFILE_DIR = 'profiles'
+PROFILE_TOP = 30
+PROFILE_SIGNAL_CYCLES = 3
+
+# Логирование
+LOG_FILE = 'parser.log'
+LOG_LEVEL = 'INFO'
+LOG_JSON = True
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+LOG_SUMMARY_ITEMS = 5
+
+# Парсеры, которые бот опрашивает в одном процессе, по путям импорта:
+# модули загружаются при создании приложения, а не при импорте bot_app.bot
+DEFAULT_PARSERS = [
+    'bot_app.scraping.parsers:InvestingParserSelenium',
+    # 'bot_app.parsers:RBCParser',
+]
+
+# Распределение источников по процессам: 0 - всё в одном процессе
+SHARD_WORKERS = 0
+SHARD_PARSERS = [
+    'bot_app.scraping.parsers:InvestingParserSelenium',
+    # 'bot_app.parsers:RBCParser',
+    # источник из sources.toml: 'bot_app.sources:<name>'
+]
+# адрес для воркеров на других машинах, например ('0.0.0.0', 50000)
+SHARD_ADDRESS = None
+SHARD_AUTHKEY = os.getenv('SHARD_AUTHKEY', '').encode()
+SHARD_HANDOFF_SIZE = 1000
+# сколько ждать, пока воркер закроет браузеры и выйдет, прежде чем убить его
+SHARD_STOP_TIMEOUT = 30
+
+# Источники из конфигурации
+SOURCES_PATH = 'sources.toml'
@@ -0,0 +1,225 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from bot_app.consts import (
+    DEDUP_CAPACITY,
+    DEDUP_DISTANCE,
+    DEDUP_NUMBER_WEIGHT,
+    DEDUP_STEM_LENGTH,
+    DEDUP_WINDOW
+)
+from bot_app.metrics import registry
+
+
+SIGNATURE_BITS = 64
+WORD = re.compile(r'\w+')
+
+
+@lru_cache(maxsize=65536)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(
+        hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little'
+    )
+
+
+def features(text: str, stem_length=DEDUP_STEM_LENGTH) -> list:
+    """
+    Признаки текста с весами: основы слов и числа. Основа - начало слова,
+    чтобы "ставку"/"ставки" и "повысил"/"повысили" совпадали. Числа весят
+    больше: "ставка 21%" и "ставка 16%" - разные новости. Пары соседних
+    слов не берём, у пересказа одной новости они почти все разные.
+    """
+    return [
+        (word, DEDUP_NUMBER_WEIGHT) if word.isdigit() else (word[:stem_length], 1)
+        for word in WORD.findall(text.lower().replace('ё', 'е'))
+        if len(word) > 2 or word.isdigit()
+    ]
+
+
+def simhash(text: str) -> int:
+    """64-битный SimHash: у похожих текстов различаются немногие биты."""
+    weights = [0] * SIGNATURE_BITS
+    for feature, weight in features(text):
+        value = _feature_hash(feature)
+        for bit in range(SIGNATURE_BITS):
+            weights[bit] += weight if value >> bit & 1 else -weight
+    signature = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            signature |= 1 << bit
+    return signature
+
+
+def stems(text: str) -> frozenset:
+    """Основы слов и числа текста, как в `features`, без весов."""
+    return frozenset(feature for feature, _ in features(text or ''))
+
+
+def marks(title: str, stem_length=DEDUP_STEM_LENGTH) -> frozenset:
+    """
+    Числа и имена из заголовка: слова латиницей, аббревиатуры и слова
+    с заглавной буквы не в начале. "Акции Apple выросли на 5%" и "Акции
+    Tesla выросли на 5%" различаются только ими.
+    """
+    result = set()
+    for index, word in enumerate(WORD.findall(title or '')):
+        if word.isdigit():
+            result.add(word)
+        elif word.isascii() or len(word) > 1 and word.isupper() or index and word[0].isupper():
+            result.add(word.lower().replace('ё', 'е')[:stem_length])
+    return frozenset(result)
+
+
+class NewsSignature:
+    """Подпись новости и то, что нужно для проверки найденного кандидата."""
+
+    def __init__(self, source, title, lead=None):
+        self.source = source
+        lead = lead if lead and lead != title else None
+        # без лида у заголовка мало слов, и SimHash различает новости плохо
+        self.title_only = lead is None
+        text = ' '.join(part for part in (title, lead) if part)
+        self.value = simhash(text)
+        self.marks = marks(title)
+        # в основах нет коротких слов, а в именах есть: "ЦБ", "ЕС"
+        self.words = stems(text) | self.marks
+        self.sent = False
+        self.ts = time.monotonic()
+
+    def matches(self, other, distance) -> bool:
+        if self.title_only or other.title_only:
+            # только заголовок: те же слова с точностью до окончаний
+            return self.words == other.words
+        if (self.value ^ other.value).bit_count() > distance:
+            return False
+        # у каждой есть число или имя, которого нет в другой, -
+        # это разные новости по одному шаблону
+        return not (self.marks - other.words and other.marks - self.words)
+
+
+class NearDuplicateIndex:
+    """
+    Подписи новостей всех источников: отправленных и тех, что сейчас
+    отправляются.
+
+    Подпись делится на `distance + 1` полос, и по каждой полосе ведётся
+    словарь. Если подписи различаются не больше чем в `distance` битах,
+    хотя бы одна полоса у них совпадает, поэтому проверка смотрит только
+    записи с общей полосой, а не всю историю. Записи старше `window`
+    и сверх `capacity` вытесняются в порядке добавления.
+
+    Новость становится образцом для дублей только после доставки
+    (`register`). Пока она отправляется, её копии с других источников
+    откладываются, а не отбрасываются: если отправка не удалась,
+    `release` убирает запись, и копия уйдёт вместо неё.
+    """
+
+    def __init__(self, distance=DEDUP_DISTANCE, window=DEDUP_WINDOW, capacity=DEDUP_CAPACITY):
+        self.distance = distance
+        self.window = window
+        self.capacity = capacity
+        bands = distance + 1
+        edges = [SIGNATURE_BITS * i // bands for i in range(bands + 1)]
+        # (сдвиг, маска) каждой полосы
+        self.bands = [
+            (start, (1 << (end - start)) - 1) for start, end in zip(edges, edges[1:])
+        ]
+        # ключ -> NewsSignature
+        self._entries = OrderedDict()
+        self._buckets = [{} for _ in self.bands]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _band_values(self, signature):
+        for index, (shift, mask) in enumerate(self.bands):
+            yield index, signature >> shift & mask
+
+    def _insert(self, key, signature):
+        self._entries[key] = signature
+        for index, value in self._band_values(signature.value):
+            self._buckets[index].setdefault(value, set()).add(key)
+
+    def _remove(self, key):
+        signature = self._entries.pop(key)
+        for index, value in self._band_values(signature.value):
+            bucket = self._buckets[index]
+            keys = bucket.get(value)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del bucket[value]
+
+    def _evict(self, now):
+        while self._entries:
+            key, signature = next(iter(self._entries.items()))
+            if now - signature.ts < self.window and len(self._entries) <= self.capacity:
+                return
+            self._remove(key)
+
+    def find(self, key, signature):
+        """
+        Ключ самой близкой записи другого источника или None. Записи
+        одного источника не сравниваются: это разные новости.
+        """
+        best, best_distance = None, SIGNATURE_BITS + 1
+        for index, value in self._band_values(signature.value):
+            for other_key in self._buckets[index].get(value, ()):
+                other = self._entries[other_key]
+                if other.source == key[0] or not signature.matches(other, self.distance):
+                    continue
+                distance = (signature.value ^ other.value).bit_count()
+                if distance < best_distance:
+                    best, best_distance = other_key, distance
+        return best
+
+    def check(self, key, title, lead=None):
+        """
+        Ищет ту же новость с другого источника. Возвращает (ключ, отправлена
+        ли она) или None. Если такой нет, запоминает новость под `key` как
+        отправляемую: проверка и запись атомарны, поэтому из двух
+        одновременно найденных копий дальше пройдёт только одна.
+        """
+        signature = NewsSignature(key[0], title, lead)
+        with self._lock:
+            self._evict(signature.ts)
+            if key in self._entries:
+                # повторная попытка отправить ту же новость
+                return None
+            match = self.find(key, signature)
+            if match is not None:
+                return match, self._entries[match].sent
+            self._insert(key, signature)
+            self._evict(signature.ts)
+        return None
+
+    def register(self, key, title, lead=None):
+        """Отмечает новость доставленной: теперь её копии - дубли."""
+        with self._lock:
+            signature = self._entries.get(key)
+            if signature is None:
+                signature = NewsSignature(key[0], title, lead)
+                self._insert(key, signature)
+            signature.sent = True
+            self._evict(time.monotonic())
+
+    def release(self, key):
+        """Забывает неотправленную новость, отправленные остаются."""
+        with self._lock:
+            signature = self._entries.get(key)
+            if signature is not None and not signature.sent:
+                self._remove(key)
+
+
+near_duplicates = NearDuplicateIndex()
+
+registry.callback(
+    'near_duplicate_index_size',
+    'Новости в индексе поиска дублей между источниками',
+    lambda: [({}, len(near_duplicates))]
+)
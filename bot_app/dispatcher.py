@@ -0,0 +1,225 @@
+import heapq
+import itertools
+import threading
+import time
+
+from bot_app.consts import (
+    DISPATCH_BACKOFF_BASE,
+    DISPATCH_BACKOFF_MAX,
+    DISPATCH_CHAT_BURST,
+    DISPATCH_CHAT_RATE,
+    DISPATCH_GLOBAL_BURST,
+    DISPATCH_GLOBAL_RATE,
+    DISPATCH_MAX_ATTEMPTS
+)
+from bot_app.log import logger
+from bot_app.metrics import stage
+
+
+class TokenBucket:
+    """Ограничитель частоты: `rate` токенов в секунду, запас до `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Сколько секунд ждать до появления токена."""
+        self._refill()
+        if self.tokens >= 1:
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self._refill()
+        self.tokens -= 1
+
+
+class OutboundMessage:
+    """Сообщение в очереди на отправку и колбэки о результате доставки."""
+
+    def __init__(
+        self, chat_id, text, parse_mode=None, on_success=None, on_failure=None,
+        source=''
+    ):
+        self.chat_id = chat_id
+        self.text = text
+        self.parse_mode = parse_mode
+        self.on_success = on_success
+        self.on_failure = on_failure
+        # источник новости для метрик
+        self.source = source
+        self.attempts = 0
+
+
+def retry_after(exc) -> float:
+    """retry_after из ответа 429 Telegram или None."""
+    if getattr(exc, 'error_code', None) != 429:
+        return None
+    result = getattr(exc, 'result_json', None) or {}
+    return result.get('parameters', {}).get('retry_after')
+
+
+class OutboundDispatcher:
+    """
+    Отправляет сообщения в Telegram в отдельном потоке.
+
+    Частота ограничена token bucket'ами на каждый чат и общим.
+    При 429 выдерживается retry_after от Telegram, при прочих ошибках -
+    экспоненциальная пауза, после DISPATCH_MAX_ATTEMPTS попыток
+    вызывается on_failure. Сообщения одного чата уходят по порядку.
+    """
+
+    def __init__(
+        self,
+        send,
+        global_rate=DISPATCH_GLOBAL_RATE,
+        global_burst=DISPATCH_GLOBAL_BURST,
+        chat_rate=DISPATCH_CHAT_RATE,
+        chat_burst=DISPATCH_CHAT_BURST,
+        max_attempts=DISPATCH_MAX_ATTEMPTS,
+        backoff_base=DISPATCH_BACKOFF_BASE,
+        backoff_max=DISPATCH_BACKOFF_MAX
+    ):
+        self.send = send
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = {}
+        self.chat_blocked_until = {}
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._heap = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _push(self, ready_ts, seq, message):
+        heapq.heappush(self._heap, (ready_ts, seq, message))
+        self._cond.notify()
+
+    def submit(self, message: OutboundMessage):
+        with self._cond:
+            self._push(time.monotonic(), next(self._counter), message)
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='dispatcher', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=1):
+        """Останавливает отправку; неотправленные сообщения остаются в очереди."""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        if chat_id not in self.chat_buckets:
+            self.chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        return self.chat_buckets[chat_id]
+
+    def _next(self):
+        """Ждёт сообщение, которое можно отправить прямо сейчас."""
+        with self._cond:
+            while not self._stop.is_set():
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                ready_ts, seq, message = self._heap[0]
+                now = time.monotonic()
+                if ready_ts > now:
+                    self._cond.wait(ready_ts - now)
+                    continue
+                heapq.heappop(self._heap)
+
+                blocked_until = self.chat_blocked_until.get(message.chat_id, 0)
+                wait = max(
+                    blocked_until - now,
+                    self._chat_bucket(message.chat_id).wait_time(),
+                    self.global_bucket.wait_time()
+                )
+                if wait > 0:
+                    # порядок внутри чата сохраняется за счёт seq
+                    self._push(now + wait, seq, message)
+                    continue
+                self._chat_bucket(message.chat_id).take()
+                self.global_bucket.take()
+                return seq, message
+        return None, None
+
+    def _deliver(self, seq, message: OutboundMessage):
+        message.attempts += 1
+        try:
+            with stage('telegram_send', message.source):
+                self.send(
+                    chat_id=message.chat_id,
+                    text=message.text,
+                    parse_mode=message.parse_mode
+                )
+        except Exception as e:
+            delay = retry_after(e)
+            if delay is not None:
+                logger.warning(
+                    'Telegram rate limit for %s, retry after %ss',
+                    message.chat_id, delay
+                )
+                # ограничение частоты - не ошибка сообщения, попытку не считаем
+                message.attempts -= 1
+            else:
+                delay = min(
+                    self.backoff_max,
+                    self.backoff_base * 2 ** (message.attempts - 1)
+                )
+                logger.error('Exception on sending msg to channel: %s', e)
+
+            if message.attempts >= self.max_attempts:
+                logger.error(
+                    'Giving up on message to %s after %s attempts',
+                    message.chat_id, message.attempts
+                )
+                if message.on_failure:
+                    try:
+                        message.on_failure(e)
+                    except Exception as callback_exc:
+                        logger.exception(
+                            'Error in delivery callback: %s', callback_exc
+                        )
+                return
+            # до повтора чат стоит целиком, чтобы не нарушить порядок сообщений
+            until = time.monotonic() + delay
+            with self._cond:
+                self.chat_blocked_until[message.chat_id] = until
+                self._push(until, seq, message)
+            return
+
+        if message.on_success:
+            try:
+                message.on_success()
+            except Exception as e:
+                logger.exception('Error in delivery callback: %s', e)
+
+    def _run(self):
+        while not self._stop.is_set():
+            seq, message = self._next()
+            if message is None:
+                return
+            self._deliver(seq, message)
@@ -1,6 +1,187 @@
+import json
+import logging
+import re
+import shutil
+import subprocess
+import threading
+import time
 from pathlib import Path
 
 
-DRIVERS: dict = {
-    path.stem: path.as_posix() for path in Path(__file__).parent.joinpath('driver_files').iterdir()
+logger = logging.getLogger(__name__)
+
+DRIVER_FILES_DIR = Path(__file__).parent.joinpath('driver_files')
+MANIFEST_PATH = DRIVER_FILES_DIR.joinpath('manifest.json')
+
+
+def _index_driver_files() -> dict:
+    if not DRIVER_FILES_DIR.is_dir():
+        return {}
+    return {
+        path.stem: path.as_posix() for path in DRIVER_FILES_DIR.iterdir()
+        if path.is_file() and path != MANIFEST_PATH
+    }
+
+
+DRIVERS: dict = _index_driver_files()
+
+
+def _chrome_manager():
+    from webdriver_manager.chrome import ChromeDriverManager
+    return ChromeDriverManager().install()
+
+
+def _gecko_manager():
+    from webdriver_manager.firefox import GeckoDriverManager
+    return GeckoDriverManager().install()
+
+
+def _edge_manager():
+    from webdriver_manager.microsoft import EdgeChromiumDriverManager
+    return EdgeChromiumDriverManager().install()
+
+
+MANAGERS = {
+    'chromedriver': _chrome_manager,
+    'geckodriver': _gecko_manager,
+    'msedgedriver': _edge_manager,
 }
+
+# браузеры, под версию которых подбирается драйвер
+BROWSERS = {
+    'chromedriver': ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser'),
+    'msedgedriver': ('microsoft-edge', 'microsoft-edge-stable'),
+}
+
+_resolved: dict = {}
+# драйверы, с которыми браузер не запустился: ищем их заново через сеть
+_stale: set = set()
+_lock = threading.Lock()
+
+
+def _read_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest: dict):
+    DRIVER_FILES_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = MANIFEST_PATH.with_suffix('.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    tmp_path.replace(MANIFEST_PATH)
+
+
+def _driver_version(path: str) -> str:
+    try:
+        output = subprocess.run(
+            [path, '--version'], capture_output=True, text=True, timeout=10
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    match = re.search(r'\d+(\.\d+)+', output)
+    return match.group(0) if match else ''
+
+
+def _browser_version(name: str) -> str:
+    """Версия браузера для драйвера `name` или '', если браузер не найден."""
+    for binary in BROWSERS.get(name, ()):
+        path = shutil.which(binary)
+        if path:
+            return _driver_version(path)
+    return ''
+
+
+def _major(version: str) -> str:
+    return version.split('.', 1)[0]
+
+
+def _matches_browser(name: str, path: str, browser_version: str, driver_version=None) -> bool:
+    """
+    Подходит ли драйвер к установленному браузеру по старшей версии.
+    Если версию браузера узнать не удалось (например, его нет в PATH),
+    считаем, что подходит: тогда выручает forget_driver.
+    """
+    if not browser_version:
+        return True
+    driver_version = driver_version or _driver_version(path)
+    if driver_version and _major(driver_version) != _major(browser_version):
+        logger.info(
+            'Драйвер %s %s не подходит к браузеру %s', name, driver_version, browser_version
+        )
+        return False
+    return True
+
+
+def forget_driver(name: str):
+    """
+    Забывает найденный путь драйвера `name`, например после session not
+    created: следующий resolve_driver скачает драйвер через webdriver_manager.
+    """
+    with _lock:
+        if name not in MANAGERS:
+            return
+        _resolved.pop(name, None)
+        _stale.add(name)
+        manifest = _read_manifest()
+        if manifest.pop(name, None) is not None:
+            try:
+                _write_manifest(manifest)
+            except OSError as e:
+                logger.warning('Не удалось сохранить %s: %s', MANIFEST_PATH, e)
+        logger.warning('Драйвер %s будет найден заново', name)
+
+
+def resolve_driver(name: str) -> str:
+    """
+    Возвращает путь к бинарнику драйвера `name`.
+
+    Путь ищется один раз за процесс: сначала в driver_files, затем в
+    manifest.json, и только если там ничего нет - через webdriver_manager.
+    Найденный путь и версия сохраняются в manifest.json, поэтому сеть
+    нужна только при первом запуске и после обновления браузера: драйвер
+    другой старшей версии, чем браузер, не используется.
+    """
+    with _lock:
+        if name in _resolved:
+            return _resolved[name]
+
+        manifest = _read_manifest()
+        entry = manifest.get(name, {})
+        browser_version = '' if name in _stale else _browser_version(name)
+        path = None
+        source = None
+        if name not in _stale:
+            candidates = [('driver_files', DRIVERS.get(name), None)]
+            if entry.get('path') and Path(entry['path']).is_file():
+                candidates.append(('manifest', entry['path'], entry.get('version')))
+            for source, path, version in candidates:
+                if path and _matches_browser(name, path, browser_version, version):
+                    break
+            else:
+                path = None
+        if not path:
+            if name not in MANAGERS:
+                raise FileNotFoundError(f'Драйвер {name} не найден')
+            logger.info('Драйвер %s не найден локально, скачиваем', name)
+            path = MANAGERS[name]()
+            source = 'webdriver_manager'
+            _stale.discard(name)
+
+        if source == 'webdriver_manager' or entry.get('path') != path:
+            manifest[name] = {
+                'path': path,
+                'version': _driver_version(path),
+                'resolved_at': int(time.time())
+            }
+            try:
+                _write_manifest(manifest)
+            except OSError as e:
+                logger.warning('Не удалось сохранить %s: %s', MANIFEST_PATH, e)
+
+        logger.info('Драйвер %s (%s): %s', name, source, path)
+        _resolved[name] = path
+        return path
@@ -6,3 +6,13 @@ class HTMLBlockNotFound(Exception):
 class HTMLError(Exception):
     """Ошибка доступа к странице."""
     pass
+
+
+class ChallengeDetected(HTMLError):
+    """Вместо страницы пришла защита от ботов или пустой ответ."""
+    pass
+
+
+class ConfigError(Exception):
+    """Не хватает настроек для запуска бота."""
+    pass
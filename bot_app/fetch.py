@@ -0,0 +1,141 @@
+import asyncio
+import importlib.util
+import threading
+from urllib.parse import urlparse
+
+from bot_app.consts import (
+    FETCH_MAX_CONNECTIONS,
+    FETCH_PER_HOST_LIMIT,
+    FETCH_TIMEOUT
+)
+from bot_app.log import logger
+
+# httpx импортируется при первом запросе, а наличие h2 проверяем без импорта
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+class FetchEngine:
+    """
+    Асинхронный HTTP-клиент с общим пулом соединений.
+
+    Все запросы идут через один httpx.AsyncClient в отдельном потоке
+    с event loop, поэтому keep-alive соединения переиспользуются между
+    опросами. Для синхронного кода есть обёртка `get`.
+    """
+
+    def __init__(
+        self,
+        max_connections=FETCH_MAX_CONNECTIONS,
+        per_host=FETCH_PER_HOST_LIMIT,
+        timeout=FETCH_TIMEOUT,
+        http2=HTTP2_AVAILABLE
+    ):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = timeout
+        self.http2 = http2
+        self._loop = None
+        self._thread = None
+        self._client = None
+        self._host_limits = {}
+        self._validators = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='fetch-engine',
+                    daemon=True
+                )
+                self._thread.start()
+            return self._loop
+
+    @property
+    def client(self) -> 'httpx.AsyncClient':
+        if self._client is None:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                )
+            )
+        return self._client
+
+    def _host_limit(self, url) -> asyncio.Semaphore:
+        host = urlparse(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    def _conditional_headers(self, url, headers) -> dict:
+        etag, last_modified = self._validators.get(url, (None, None))
+        headers = dict(headers or {})
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    async def fetch(self, url, headers=None, timeout=None, conditional=False) -> 'httpx.Response':
+        """
+        GET-запрос. С `conditional` отправляет сохранённые ETag/Last-Modified,
+        и если страница не менялась, сервер отвечает 304 без тела.
+        """
+        if conditional:
+            headers = self._conditional_headers(url, headers)
+        async with self._host_limit(url):
+            response = await self.client.get(
+                url,
+                headers=headers,
+                timeout=self.timeout if timeout is None else timeout
+            )
+        if conditional and response.status_code == 200:
+            validators = (
+                response.headers.get('ETag'),
+                response.headers.get('Last-Modified')
+            )
+            if any(validators):
+                self._validators[url] = validators
+        return response
+
+    def forget(self, url):
+        """Сбрасывает сохранённые валидаторы, следующий запрос будет полным."""
+        self._validators.pop(url, None)
+
+    def run(self, coro):
+        """Выполняет корутину в цикле движка и ждёт результат."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def get(self, url, headers=None, timeout=None, conditional=False) -> 'httpx.Response':
+        return self.run(
+            self.fetch(url, headers=headers, timeout=timeout, conditional=conditional)
+        )
+
+    def close(self):
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None:
+            return
+        if self._client is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(
+                    self._client.aclose(), loop
+                ).result(timeout=5)
+            except Exception as e:
+                logger.warning('Error on closing fetch engine: %s', e)
+            self._client = None
+        self._host_limits = {}
+        loop.call_soon_threadsafe(loop.stop)
+
+
+engine = FetchEngine()
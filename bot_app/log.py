@@ -1,29 +1,142 @@
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from bot_app.consts import (
+    LOG_BACKUP_COUNT,
+    LOG_FILE,
+    LOG_JSON,
+    LOG_LEVEL,
+    LOG_MAX_BYTES,
+    LOG_SUMMARY_ITEMS
+)
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON."""
+
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created))
+            + '.{:03d}'.format(int(record.msecs)),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'msg': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record):
+        # аргументы подставляем сразу, пока объекты не изменились;
+        # форматирование в JSON и запись на диск - в потоке слушателя
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # traceback не передать в другой процесс, берём текст
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class Summary:
+    """
+    Короткое описание большой коллекции для сообщений лога:
+    размер и первые `limit` элементов. Строится только если запись
+    действительно пишется, поэтому стоимость не растёт с размером.
+    """
+
+    def __init__(self, collection, limit=LOG_SUMMARY_ITEMS):
+        self.collection = collection
+        self.limit = limit
+
+    def __str__(self):
+        try:
+            size = len(self.collection)
+        except TypeError:
+            return repr(self.collection)
+        head = []
+        for item in self.collection:
+            if len(head) >= self.limit:
+                break
+            head.append(repr(item))
+        more = ', ...' if size > len(head) else ''
+        return '{}({}: [{}{}])'.format(
+            type(self.collection).__name__, size, ', '.join(head), more
+        )
+
+    __repr__ = __str__
+
+
+def summarize(collection, limit=LOG_SUMMARY_ITEMS) -> Summary:
+    """logger.debug('Seen ids: %s', summarize(ids))"""
+    return Summary(collection, limit)
+
 
 # Set up logging configuration
 logger = logging.getLogger()
-logger.setLevel(logging.DEBUG)  # Set root logger to the lowest level
+# ниже этого уровня записи не создаются вовсе
+logger.setLevel(LOG_LEVEL)
 
 # Create a rotating file handler for INFO level logging
 rotating_handler = RotatingFileHandler(
-    "parser.log",  # Log file name
-    maxBytes=5 * 1024 * 1024,  # Maximum log file size in bytes (5MB in this example)
-    backupCount=5  # Number of backup files to keep
+    LOG_FILE,
+    maxBytes=LOG_MAX_BYTES,
+    backupCount=LOG_BACKUP_COUNT,
+    encoding='utf-8',
+    # файл открывается при первой записи, процессы-воркеры его не трогают
+    delay=True
 )
-rotating_handler.setLevel(logging.INFO)  # Set file handler level to INFO
+rotating_handler.setLevel(LOG_LEVEL)
 
-# Create a console handler for DEBUG level logging
+# Create a console handler
 console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)  # Set console handler level to DEBUG
+console_handler.setLevel(LOG_LEVEL)
 
 # Define the log format
 formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-# Attach the formatter to both handlers
-rotating_handler.setFormatter(formatter)
+rotating_handler.setFormatter(JsonFormatter() if LOG_JSON else formatter)
 console_handler.setFormatter(formatter)
 
-# Add both handlers to the logger
-logger.addHandler(rotating_handler)
-logger.addHandler(console_handler)
+# Потоки парсеров только кладут записи в очередь,
+# а пишет их в файл и консоль отдельный поток
+log_queue = queue.SimpleQueue()
+queue_handler = _QueueHandler(log_queue)
+listener = QueueListener(
+    log_queue, rotating_handler, console_handler, respect_handler_level=True
+)
+listener.start()
+atexit.register(listener.stop)
+
+logger.addHandler(queue_handler)
+
+
+def forward_to(process_queue):
+    """
+    Для дочернего процесса: записи уходят в `process_queue`,
+    а пишет их слушатель `listen` в главном процессе.
+    """
+    listener.stop()
+    atexit.unregister(listener.stop)
+    logger.removeHandler(queue_handler)
+    logger.addHandler(_QueueHandler(process_queue))
+
+
+def listen(process_queue) -> QueueListener:
+    """Пишет записи дочерних процессов теми же обработчиками, что и свои."""
+    process_listener = QueueListener(
+        process_queue, rotating_handler, console_handler, respect_handler_level=True
+    )
+    process_listener.start()
+    return process_listener
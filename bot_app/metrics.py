@@ -0,0 +1,266 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from bot_app.consts import METRICS_BUCKETS, METRICS_HOST, METRICS_PORT
+from bot_app.log import logger
+
+
+def _label_key(labelnames, labels) -> tuple:
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+        )
+        for name, value in labels.items()
+    )
+    return '{' + pairs + '}'
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(self.labelnames, labels), 0)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как в Prometheus."""
+    type = 'histogram'
+
+    def __init__(self, name, help, labelnames=(), buckets=METRICS_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ключ меток -> [счётчики по корзинам (+Inf последней), сумма, количество]
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            counts, _, _ = entry = self._values[key]
+            counts[index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def series(self) -> dict:
+        """{метки: (счётчики корзин, сумма, количество)}"""
+        with self._lock:
+            return {
+                key: (list(counts), total, count)
+                for key, (counts, total, count) in self._values.items()
+            }
+
+    def quantile(self, q, counts) -> float:
+        """Оценка квантиля по корзинам линейной интерполяцией."""
+        rank = q * sum(counts)
+        cumulative = 0
+        for index, count in enumerate(counts):
+            if cumulative + count >= rank and count:
+                lower = self.buckets[index - 1] if index else 0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - cumulative) / count
+            cumulative += count
+        return 0.0
+
+    def samples(self):
+        for key, (counts, total, count) in sorted(self.series().items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                yield self.name + '_bucket', dict(labels, le=le), cumulative
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, count
+
+
+class Callback:
+    """Метрика, значения которой считываются функцией в момент запроса."""
+
+    def __init__(self, name, help, func, type='gauge'):
+        self.name = name
+        self.help = help
+        self.func = func
+        self.type = type
+
+    def samples(self):
+        try:
+            values = list(self.func())
+        except Exception as e:
+            logger.warning('Error on collecting metric %s: %s', self.name, e)
+            return
+        for labels, value in values:
+            yield self.name, labels, value
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()) -> Counter:
+        return self._register(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=METRICS_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labelnames, buckets))
+
+    def callback(self, name, help, func, type='gauge') -> Callback:
+        """`func` возвращает пары (метки, значение)."""
+        return self._register(Callback(name, help, func, type))
+
+    def metrics(self) -> list:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus."""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_seconds = registry.histogram(
+    'news_stage_seconds', 'Длительность этапов обработки новостей',
+    ('stage', 'source')
+)
+stage_errors = registry.counter(
+    'news_stage_errors_total', 'Ошибки на этапах обработки новостей',
+    ('stage', 'source')
+)
+news_items = registry.counter(
+    'news_items_total', 'Новости по источникам: найдено, отправлено, не отправлено',
+    ('source', 'event')
+)
+
+
+@contextmanager
+def stage(name, source=''):
+    """Замеряет этап `name` для источника `source`, исключения считает ошибками."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        stage_errors.inc(stage=name, source=source)
+        raise
+    finally:
+        stage_seconds.observe(time.perf_counter() - start, stage=name, source=source)
+
+
+def summary(limit=None) -> str:
+    """
+    Краткая сводка для /status: p50/p95 этапов по всем источникам сразу,
+    счётчики новостей одной строкой на источник и текущие показатели.
+    С `limit` обрезается по целым строкам, чтобы влезть в сообщение.
+    """
+    stages = {}
+    for (name, _), (counts, _, count) in stage_seconds.series().items():
+        merged = stages.setdefault(name, [[0] * len(counts), 0])
+        merged[0] = [a + b for a, b in zip(merged[0], counts)]
+        merged[1] += count
+    errors = {}
+    for _, labels, value in stage_errors.samples():
+        errors[labels['stage']] = errors.get(labels['stage'], 0) + value
+    lines = []
+    for name, (counts, count) in sorted(stages.items()):
+        lines.append(
+            '{}: {} шт., p50 {:.2f}s, p95 {:.2f}s{}'.format(
+                name, count,
+                stage_seconds.quantile(0.5, counts),
+                stage_seconds.quantile(0.95, counts),
+                f', ошибок {errors[name]}' if errors.get(name) else ''
+            )
+        )
+    sources = {}
+    for _, labels, value in news_items.samples():
+        sources.setdefault(labels['source'], []).append(f'{labels["event"]} {value}')
+    for source, events in sorted(sources.items()):
+        lines.append('{}: {}'.format(source, ', '.join(events)))
+    for metric in registry.metrics():
+        if isinstance(metric, Callback):
+            for name, labels, value in metric.samples():
+                label = ','.join(str(v) for v in labels.values())
+                lines.append(f'{name}{f"[{label}]" if label else ""}: {value}')
+
+    text = '\n'.join(lines)
+    if limit is not None and len(text) > limit:
+        text = text[:max(0, limit - 2)].rpartition('\n')[0] + '\n…'
+    return text
+
+
+def start_server(host=METRICS_HOST, port=METRICS_PORT) -> 'ThreadingHTTPServer':
+    """Отдаёт метрики на http://host:port/metrics из фонового потока."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True
+    ).start()
+    logger.info('Serving metrics on http://%s:%s/metrics', host, port)
+    return server
@@ -0,0 +1,93 @@
+import json
+import re
+
+
+NEXT_DATA_MARKER = b'id="__NEXT_DATA__"'
+SCRIPT_END = b'</script>'
+NEWS_STORE_PATH = ['props', 'pageProps', 'state', 'newsStore']
+
+# строка JSON целиком или скобка
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_COLON = re.compile(rb'\s*:\s*')
+
+
+def find_next_data(raw: bytes) -> bytes:
+    """
+    Возвращает содержимое <script id="__NEXT_DATA__"> из сырого ответа,
+    не строя DOM страницы.
+    """
+    start = raw.find(NEXT_DATA_MARKER)
+    if start == -1:
+        return None
+    start = raw.find(b'>', start)
+    if start == -1:
+        return None
+    end = raw.find(SCRIPT_END, start)
+    if end == -1:
+        return None
+    return raw[start + 1:end]
+
+
+def walk_path(data, path):
+    for key in path:
+        data = data[key]
+    return data
+
+
+def _value_starts(payload: bytes, key):
+    """Позиции начала значений ключа `key` в JSON `payload`."""
+    needle = json.dumps(key).encode()
+    pos = payload.find(needle)
+    while pos != -1:
+        end = pos + len(needle)
+        # ключ внутри строки экранирован: \"key\"
+        if pos == 0 or payload[pos - 1] != ord('\\'):
+            colon = _COLON.match(payload, end)
+            if colon:
+                yield colon.end()
+        pos = payload.find(needle, end)
+
+
+def find_value_span(payload: bytes, key) -> tuple:
+    """
+    Границы (start, end) в `payload` объекта или списка под ключом `key`.
+
+    Скобки считаются регулярным выражением, которое перескакивает через
+    строки целиком, поэтому JSON при этом не декодируется.
+    """
+    for start in _value_starts(payload, key):
+        if payload[start:start + 1] not in (b'{', b'['):
+            continue
+        depth = 0
+        for token in _TOKEN.finditer(payload, start):
+            if token.group() in (b'{', b'['):
+                depth += 1
+            elif token.group() in (b'}', b']'):
+                depth -= 1
+                if depth == 0:
+                    return start, token.end()
+    return None
+
+
+def load_subtree(payload: bytes, path: list):
+    """
+    Декодирует из JSON `payload` только значение по пути `path`.
+
+    Находит в байтах значение ключа `path[-1]` и разбирает только его.
+    Если ключ так не найти, разбирает весь JSON целиком.
+    """
+    span = find_value_span(payload, path[-1])
+    if span is not None:
+        try:
+            return json.loads(payload[span[0]:span[1]])
+        except ValueError:
+            pass
+    return walk_path(json.loads(payload), path)
+
+
+def extract_news_store(raw: bytes) -> dict:
+    """newsStore из __NEXT_DATA__ страницы investing.com или None."""
+    payload = find_next_data(raw)
+    if payload is None:
+        return None
+    return load_subtree(payload, NEWS_STORE_PATH)
@@ -0,0 +1,241 @@
+import atexit
+import json
+import threading
+import time
+
+from bot_app.consts import (
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_COMPACT_PERIOD,
+    OUTBOX_DB_PATH,
+    OUTBOX_FLUSH_INTERVAL,
+    OUTBOX_RETENTION
+)
+from bot_app.log import logger
+from bot_app.metrics import registry
+from bot_app.storage import connect
+
+
+PENDING = 'pending'
+SENT = 'sent'
+DROPPED = 'dropped'
+
+
+class OutboxEntry:
+    """Новость с готовым текстом сообщения, ждущая отправки."""
+
+    def __init__(self, source, news_id, chat_id, item, text, parse_mode=None, created=None):
+        self.source = source
+        self.news_id = str(news_id)
+        self.chat_id = chat_id
+        # новость из списка источника: id, title, link, lead
+        self.item = item
+        self.text = text
+        self.parse_mode = parse_mode
+        self.created = time.time() if created is None else created
+
+    @property
+    def key(self) -> tuple:
+        return self.source, self.news_id
+
+
+class Outbox:
+    """
+    Очередь отправки в SQLite, которая переживает падение и перезапуск.
+
+    Новость попадает сюда вместе с уже готовым текстом статьи до передачи
+    диспетчеру и помечается отправленной после доставки. После перезапуска
+    ожидающие записи отправляются сразу, без повторного парсинга и браузера.
+
+    Изменения копятся в памяти и пишутся одной транзакцией из фонового
+    потока, поэтому fsync один на пачку записей, а не на каждую новость.
+    Если процесс упадёт до записи пачки, новость не потеряется: она ещё
+    не отмечена опубликованной и будет найдена на источнике заново.
+    """
+
+    def __init__(
+        self,
+        path=OUTBOX_DB_PATH,
+        flush_interval=OUTBOX_FLUSH_INTERVAL,
+        batch_size=OUTBOX_BATCH_SIZE,
+        retention=OUTBOX_RETENTION,
+        compact_period=OUTBOX_COMPACT_PERIOD
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.retention = retention
+        self.compact_period = compact_period
+        self._conn = None
+        # ожидающие записи по ключу (источник, ID), в порядке добавления
+        self._pending = None
+        # изменения, ещё не записанные на диск
+        self._buffer = []
+        self._compacted_ts = 0
+        self._cond = threading.Condition()
+        self._write_lock = threading.RLock()
+        self._thread = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = connect(self.path)
+            # каждая транзакция - с fsync, их мало благодаря пачкам
+            self._conn.execute('PRAGMA synchronous=FULL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS outbox ('
+                'source TEXT NOT NULL, id TEXT NOT NULL, chat_id TEXT NOT NULL, '
+                'item TEXT NOT NULL, text TEXT NOT NULL, parse_mode TEXT, '
+                'state TEXT NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, '
+                'PRIMARY KEY (source, id))'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS outbox_state ON outbox (state, created)'
+            )
+            self._compacted_ts = time.monotonic()
+        return self._conn
+
+    def _load(self):
+        if self._pending is not None:
+            return
+        self._pending = {}
+        rows = self.conn.execute(
+            'SELECT source, id, chat_id, item, text, parse_mode, created '
+            'FROM outbox WHERE state = ? ORDER BY created',
+            (PENDING,)
+        )
+        for source, news_id, chat_id, item, text, parse_mode, created in rows:
+            entry = OutboxEntry(
+                source, news_id, chat_id, json.loads(item), text, parse_mode, created
+            )
+            self._pending[entry.key] = entry
+
+    def _start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name='outbox', daemon=True
+            )
+            self._thread.start()
+
+    def _queue(self, change):
+        with self._cond:
+            self._buffer.append(change)
+            full = len(self._buffer) >= self.batch_size
+            self._start()
+            self._cond.notify()
+        if full:
+            self.flush()
+
+    def add(self, source, news_id, chat_id, item, text, parse_mode=None) -> OutboxEntry:
+        """Ставит новость с готовым текстом в очередь, запись на диск - пачкой."""
+        entry = OutboxEntry(source, news_id, chat_id, dict(item), text, parse_mode)
+        with self._cond:
+            self._load()
+            self._pending[entry.key] = entry
+        self._queue(('add', entry))
+        return entry
+
+    def done(self, source, news_id, state=SENT):
+        """Отмечает новость отправленной (или отброшенной)."""
+        with self._cond:
+            self._load()
+            self._pending.pop((source, str(news_id)), None)
+        self._queue(('done', (source, str(news_id), state)))
+
+    def get(self, source, news_id) -> OutboxEntry:
+        """Ожидающая запись новости или None."""
+        with self._cond:
+            self._load()
+            return self._pending.get((source, str(news_id)))
+
+    def pending(self) -> list:
+        """Ожидающие записи в порядке добавления."""
+        with self._cond:
+            self._load()
+            return list(self._pending.values())
+
+    def __len__(self):
+        with self._cond:
+            return len(self._pending) if self._pending is not None else 0
+
+    def flush(self):
+        """Записывает накопленные изменения одной транзакцией."""
+        with self._write_lock:
+            with self._cond:
+                changes, self._buffer = self._buffer, []
+            if not changes:
+                return
+            now = time.time()
+            conn = self.conn
+            try:
+                conn.execute('BEGIN')
+                for kind, value in changes:
+                    if kind == 'add':
+                        conn.execute(
+                            'INSERT OR REPLACE INTO outbox (source, id, chat_id, item, '
+                            'text, parse_mode, state, created, updated) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                            (
+                                value.source, value.news_id, str(value.chat_id),
+                                json.dumps(value.item, ensure_ascii=False, default=str),
+                                value.text, value.parse_mode, PENDING, value.created, now
+                            )
+                        )
+                    else:
+                        source, news_id, state = value
+                        conn.execute(
+                            'UPDATE outbox SET state = ?, updated = ? '
+                            'WHERE source = ? AND id = ?',
+                            (state, now, source, news_id)
+                        )
+                conn.execute('COMMIT')
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                with self._cond:
+                    # не потеряем изменения, повторим со следующей пачкой
+                    self._buffer[:0] = changes
+                raise
+            if time.monotonic() - self._compacted_ts > self.compact_period:
+                self.compact()
+
+    def compact(self):
+        """Удаляет старые отправленные записи и урезает WAL."""
+        with self._write_lock:
+            deleted = self.conn.execute(
+                'DELETE FROM outbox WHERE state != ? AND updated < ?',
+                (PENDING, time.time() - self.retention)
+            ).rowcount
+            self.conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            self._compacted_ts = time.monotonic()
+        logger.info('Outbox compacted, removed %s entries', deleted)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer:
+                    self._cond.wait()
+            # даём пачке набраться
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error('Error on writing outbox: %s', e)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self._write_lock:
+                if self._conn is not None:
+                    self._conn.close()
+                    self._conn = None
+
+
+outbox = Outbox()
+atexit.register(outbox.close)
+
+registry.callback(
+    'outbox_pending',
+    'Новости в очереди отправки на диске',
+    lambda: [({}, len(outbox))]
+)
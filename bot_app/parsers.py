@@ -1,41 +1,61 @@
 import os
+import hashlib
 import json
 import time
-import requests
 from urllib.parse import urlparse
 from abc import ABC
 from collections import deque
 
-from bs4 import BeautifulSoup
-from lxml import html
-
-from bot_app.exceptions import HTMLBlockNotFound, HTMLError
-from bot_app.consts import PARSER_NEWS_ID_DIR, PERIOD
-from bot_app.log import logger
+from bot_app.cache import article_cache, canonical_url
+from bot_app.exceptions import ChallengeDetected, HTMLBlockNotFound, HTMLError
+from bot_app.consts import (
+    BROWSER_HEADERS,
+    PARSER_NEWS_ID_DIR,
+    PERIOD,
+    POLL_RATE_WINDOW
+)
+from bot_app.fetch import engine
+from bot_app.log import logger, summarize
+from bot_app.metrics import news_items, stage
+from bot_app.polling import AdaptiveInterval
+from bot_app.next_data import (
+    NEWS_STORE_PATH,
+    find_next_data,
+    find_value_span,
+    load_subtree
+)
+from bot_app.storage import seen_store
+from bot_app.tiered import check_response
+from bot_app.utils import key_path_cache, parse_timestamp
 
 
 class AbstractParser(ABC):
     __name__ = ''
     URL = ''
+    fetcher = engine
+    headers = BROWSER_HEADERS
+    article_cache = article_cache
+    # максимальный интервал опроса и сколько опросов может идти параллельно
+    period = PERIOD
+    max_concurrency = 1
 
     def __init__(self) -> None:
-        self.cache = set()
+        self.seen = seen_store
         self.deque = deque()
         self.start_ts = None
         self.last_news_item_id = None
-        os.makedirs(f'{PARSER_NEWS_ID_DIR}', exist_ok=True)
+        self.fragment_hash = None
+        self.interval = AdaptiveInterval(max_period=self.period)
+        # ID -> время публикации новостей источника за POLL_RATE_WINDOW
+        self.published = {}
+        # ID раньше хранился в однострочном файле, переносим его в хранилище
         self.filepath = os.path.abspath(
             f'{PARSER_NEWS_ID_DIR}/{self.__name__}'
         )
-        if not os.path.exists(self.filepath):
-            logger.info(f'Creating file {self.filepath} for {self.__name__}')
-            with open(self.filepath, 'w+') as f:
-                f.close()
+        self.seen.import_legacy_file(self.__name__, self.filepath)
         logger.info(
-            (
-                f'Initialized parser for {self.__name__},'
-                f'file path: {self.filepath}'
-            )
+            'Initialized parser for %s, seen store: %s',
+            self.__name__, self.seen.path
         )
 
     def get_last_news_item_from_url(self) -> dict:
@@ -48,179 +68,252 @@ class AbstractParser(ABC):
         """
         raise NotImplementedError
 
-    def store_last_news_item_id(self, id):
-        logger.info(f'Storing last news item ID: {id} to {self.filepath}')
-        with open(self.filepath, 'w') as file:
-            file.write(str(id))
-        self.cache.add(id)
-        logger.info(
-            'Adding news {} to parser {} cache'.format(
-               id, self.__name__
-            )
+    def fetch(self, url=None, headers=None, timeout=None, conditional=False):
+        """GET-запрос через общий пул соединений, по умолчанию на self.URL."""
+        return self.fetcher.get(
+            url or self.URL, headers=headers or self.headers, timeout=timeout,
+            conditional=conditional
         )
 
+    def fragment_changed(self, fragment) -> bool:
+        """
+        Сравнивает хеш значимой части страницы с прошлым опросом.
+        Если не изменилась, разбор и проверку новостей можно пропустить.
+        """
+        if isinstance(fragment, str):
+            fragment = fragment.encode('utf-8')
+        digest = hashlib.blake2b(fragment, digest_size=16).digest()
+        if digest == self.fragment_hash:
+            return False
+        self.fragment_hash = digest
+        return True
+
+    def store_last_news_item_id(self, id):
+        logger.info('Storing last news item ID: %s for %s', id, self.__name__)
+        self.seen.add(self.__name__, id)
+
     def read_last_news_item_id(self):
-        logger.info(f'Reading old id from {self.filepath}')
-        with open(self.filepath, 'r') as file:
-            old_id = file.read()
-        logger.info(f'Last news item ID retrieved: {old_id}')
-        if old_id not in self.cache:
-            logger.info(
-                'Adding old_id {} to cache {}'.format(
-                    old_id, self.cache
-                )
-            )
-            self.cache.add(str(old_id))
+        old_id = self.seen.last(self.__name__)
+        logger.info('Last news item ID retrieved: %s', old_id)
         return old_id
 
     def renew_flag(self, old_id, new_id):
         if type(old_id) is not type(new_id):
             old_id = str(old_id)
             new_id = str(new_id)
-        if (not old_id or old_id != new_id) and new_id not in self.cache:
+        if (not old_id or old_id != new_id) and not self.seen.contains(self.__name__, new_id):
             return True
-        if new_id in self.cache:
+        return False
+
+    def get_news_items_from_url(self) -> list:
+        """
+        Все новости со страницы-списка за одну загрузку,
+        в порядке страницы (самая свежая первой).
+        """
+        result = self.get_last_news_item_from_url()
+        return [result] if result else []
+
+    def select_new_items(self, items, old_id) -> list:
+        """Отбирает ещё не опубликованные новости в порядке публикации."""
+        queued = {str(item['id']) for item in list(self.deque)}
+        if not old_id:
+            # источник опрашивается впервые: берём только верхнюю
+            # новость, остальные считаем уже увиденными
+            skipped = [item['id'] for item in items[1:]]
+            for news_id in skipped:
+                self.seen.add(self.__name__, news_id)
             logger.info(
-                'new ID {} is found in cache: {}'.format(
-                    new_id, self.cache
-                )
+                'First poll of %s, marked as seen: %s',
+                self.__name__, summarize(skipped)
             )
-        return False
+            items = items[:1]
+        new_items = [
+            item for item in items
+            if str(item['id']) not in queued
+            and self.renew_flag(old_id, item['id'])
+        ]
+        if all(item.get('ts') for item in new_items):
+            return sorted(new_items, key=lambda item: item['ts'])
+        return new_items[::-1]
+
+    def poll_interval(self) -> float:
+        """Через сколько секунд опросить источник снова."""
+        return self.interval()
+
+    def record_published(self, news_id, ts=None):
+        """
+        Запоминает время публикации новости для оценки частоты: из списка
+        источника, а если его там нет - время отправки в канал.
+        """
+        ts = parse_timestamp(ts)
+        self.published.setdefault(str(news_id), ts if ts is not None else time.time())
+
+    def update_interval(self, new_items: int, items=()):
+        for item in items:
+            if item.get('ts'):
+                self.record_published(item['id'], item['ts'])
+        since = time.time() - POLL_RATE_WINDOW
+        self.published = {
+            news_id: ts for news_id, ts in self.published.items() if ts >= since
+        }
+        self.interval.update(new_items, sorted(self.published.values()))
+        logger.debug(
+            'Next poll of %s in %.0fs', self.__name__, self.interval.current
+        )
 
     def get_last_news_object(self):
         current_ts = time.monotonic()
-        if not (self.start_ts is None or current_ts > self.start_ts + PERIOD):
-            return
 
         try:
-            result = self.get_last_news_item_from_url()
+            items = self.get_news_items_from_url()
         except Exception as e:
+            self.fragment_hash = None
+            self.fetcher.forget(self.URL)
             logger.error(
-                'Error on fetching latest news: {} on URL: {}'.format(
-                    e, self.URL
-                )
+                'Error on fetching latest news: %s on URL: %s', e, self.URL
             )
             return
 
-        if not result:
+        if not items:
+            self.update_interval(0)
             return
 
-        self.start_ts = current_ts
-        new_id = result['id']
-        old_id = self.read_last_news_item_id()
+        try:
+            old_id = self.read_last_news_item_id()
+            new_items = self.select_new_items(items, old_id)
+            self.start_ts = current_ts
+            self.update_interval(len(new_items), items)
+        except Exception as e:
+            # иначе следующий опрос увидит тот же хеш или 304 и пропустит список
+            self.fragment_hash = None
+            self.fetcher.forget(self.URL)
+            logger.error(
+                'Error on selecting latest news: %s on URL: %s', e, self.URL
+            )
+            return
 
-        if self.renew_flag(old_id, new_id):
+        news_items.inc(len(new_items), source=self.__name__, event='found')
+        for result in new_items:
             self.deque.append(result)
-            logger.info(f'New news item found. ID: {new_id}, Title: {result["title"]}')
-        else:
-            logger.info(f'No new news item found. Current ID: {old_id}, New ID: {new_id}')
+            logger.info('New news item found. ID: %s, Title: %s', result['id'], result['title'])
+        if not new_items:
+            logger.info('No new news item found. Current ID: %s, New ID: %s', old_id, items[0]['id'])
 
     def get_article_text_selenium(self, newslink):
         pass
 
+    def get_article(self, newslink) -> str:
+        """
+        Текст статьи из кеша по каноническому URL, а при промахе -
+        через get_article_text_selenium с сохранением в кеш.
+        """
+        key = canonical_url(newslink)
+        text = self.article_cache.get(key)
+        if text is not None:
+            logger.info('Article text for %s found in cache', newslink)
+            return text
+        with stage('article_render', self.__name__):
+            text = self.get_article_text_selenium(newslink)
+        if text:
+            self.article_cache.put(key, text)
+        return text
+
+    def warm_up(self):
+        """Подготовка ресурсов парсера до первого цикла."""
+        pass
+
+    def shutdown(self, force=False):
+        """Освобождение ресурсов парсера при остановке."""
+        pass
+
 
 class RBCParser(AbstractParser):
     __name__ = 'rbc_parser'
     URL = 'https://www.rbc.ru/crypto/?utm_source=topline'
 
     def get_last_news_item_from_url(self):
-        logger.info(f'Fetching last news item from URL: {self.URL}')
+        logger.info('Fetching last news item from URL: %s', self.URL)
         try:
-            resp = requests.get(self.URL)
+            with stage('listing_fetch', self.__name__):
+                resp = self.fetch(conditional=True)
+            if resp.status_code == 304:
+                logger.debug('%s not modified', self.URL)
+                return None
             if resp.status_code == 200:
-                soup = BeautifulSoup(resp.text, 'html.parser')
-
-                lookup_class = 'item js-rm-central-column-item'
-                logger.info(f'Successfully fetched data from {self.URL}')
-
-                # Находим блок новости
-                news_item = soup.find(
-                    'div',
-                    class_='item js-rm-central-column-item item_big item_with-photo js-index-exclude'
-                )
-                if news_item:
-                    # Получаем заголовок
-                    title = news_item.find(
-                        'span',
-                        class_='item__title rm-cm-item-text js-rm-central-column-item-text'
-                    ).get_text(strip=True)
-
-                    # Получаем ссылку
-                    link = news_item.find(
-                        'a',
-                        class_='item__link rm-cm-item-link js-rm-central-column-item-link'
-                    )['href']
-
-                    # Получаем id новости
-                    news_id = news_item['data-id']
-
-                    logger.debug(f'Found news item - ID: {news_id}, Title: {title}, Link: {link}')
-
-                    return {
-                        'id': news_id,
-                        'title': title,
-                        'link': link
-                    }
-                else:
-                    logger.error(f'HTML Block Not Found: {lookup_class}')
-                    raise HTMLBlockNotFound(f'{lookup_class}')
-
+                with stage('listing_parse', self.__name__):
+                    return self.parse_news_item(resp.text)
             else:
-                logger.error(f'HTTP Error: {self.URL} returned status code {resp.status_code}')
+                logger.error('HTTP Error: %s returned status code %s', self.URL, resp.status_code)
                 raise HTMLError(f'{self.URL}: {resp.status_code}')
         except Exception as e:
-            logger.exception('An error occurred while fetching news item from URL: {}'.format(str(e)))
+            logger.exception('An error occurred while fetching news item from URL: %s', e)
             raise
 
+    def parse_news_item(self, page: str) -> dict:
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(page, 'html.parser')
+
+        lookup_class = 'item js-rm-central-column-item'
+        logger.info('Successfully fetched data from %s', self.URL)
+
+        # Находим блок новости
+        news_item = soup.find(
+            'div',
+            class_='item js-rm-central-column-item item_big item_with-photo js-index-exclude'
+        )
+        if news_item:
+            if not self.fragment_changed(str(news_item)):
+                return None
+
+            # Получаем заголовок
+            title = news_item.find(
+                'span',
+                class_='item__title rm-cm-item-text js-rm-central-column-item-text'
+            ).get_text(strip=True)
+
+            # Получаем ссылку
+            link = news_item.find(
+                'a',
+                class_='item__link rm-cm-item-link js-rm-central-column-item-link'
+            )['href']
+
+            # Получаем id новости
+            news_id = news_item['data-id']
+
+            logger.debug('Found news item - ID: %s, Title: %s, Link: %s', news_id, title, link)
+
+            return {
+                'id': news_id,
+                'title': title,
+                'link': link
+            }
+        else:
+            logger.error('HTML Block Not Found: %s', lookup_class)
+            raise HTMLBlockNotFound(f'{lookup_class}')
+
 
 class InvestingParser(AbstractParser):
     __name__ = 'investing.com_parser'
     URL = 'https://ru.investing.com/news/most-popular-news'
 
-    def get_last_news_item_from_url(self) -> dict:
+    def get_news_items_from_url(self) -> list:
         try:
-            response = requests.get(self.URL)
+            with stage('listing_fetch', self.__name__):
+                response = self.fetch(conditional=True)
         except Exception as e:
-            logger.error(f'Ошибка при запросе: {e}')
+            logger.error('Ошибка при запросе: %s', e)
             raise
 
+        if response.status_code == 304:
+            logger.debug('%s not modified', self.URL)
+            return []
+        check_response(response)
+
         # Проверяем, успешен ли запрос
         if response.status_code == 200:
-            # Предположим, что данные приходят в формате JSON
-            html_content = response.text
-
-            # Создаем объект BeautifulSoup
-            soup = BeautifulSoup(html_content, 'html.parser')
-
-            # Находим тег <script> с нужным id
-            script_tag = soup.find('script', id='__NEXT_DATA__')
-
-            # Проверяем, что тег найден
-            if script_tag:
-                # Загружаем JSON данные
-                json_data = json.loads(script_tag.string)
-
-                # Извлекаем нужную информацию
-                breaking_news = json_data['props']['pageProps']['state']['newsStore']['_mostPopularNewsList']
-                if type(breaking_news) is list:
-                    news_item = breaking_news[0]
-                    title = news_item.get('title')
-                    link = news_item.get('href')
-                    news_id = news_item.get('article_ID')
-                    return {
-                        'id': news_id,
-                        'title': title,
-                        'link': f'{urlparse(self.URL).scheme}://{urlparse(self.URL).netloc}{link}'
-                    }
-                else:
-                    logger.error(
-                        (
-                            f'{__name__}: изменился формат'
-                            f'данных на странице {self.URL}'
-                        )
-                    )                
-                if title and link and news_id:
-                    logger.debug(f'Found news item - ID: {id} title: {title} href {link}')
+            with stage('listing_parse', self.__name__):
+                return self.parse_listing(response.content)
         else:
             raise Exception(
                 'Status code on request != 200: {}'.format(
@@ -228,6 +321,60 @@ class InvestingParser(AbstractParser):
                 )
             )
 
+    def parse_listing(self, content: bytes) -> list:
+        """Новости из __NEXT_DATA__ страницы; [] если список не изменился."""
+        # Достаём <script id="__NEXT_DATA__"> прямо из байтов ответа,
+        # без BeautifulSoup по всей странице
+        payload = find_next_data(content)
+
+        # Проверяем, что тег найден
+        if payload is None:
+            raise ChallengeDetected(f'{self.URL}: нет __NEXT_DATA__')
+
+        # Если список новостей не изменился, дальше не разбираем
+        span = find_value_span(payload, '_mostPopularNewsList')
+        fragment = payload[span[0]:span[1]] if span else payload
+        if not self.fragment_changed(fragment):
+            logger.debug('%s: news list unchanged', self.URL)
+            return []
+
+        # Извлекаем нужную информацию
+        if span:
+            key_path_cache.hit()
+            breaking_news = json.loads(fragment)
+        else:
+            breaking_news = key_path_cache.resolve(
+                load_subtree(payload, NEWS_STORE_PATH),
+                '_mostPopularNewsList',
+                self.__name__
+            )
+        if type(breaking_news) is list:
+            return [
+                self.news_item(news_item) for news_item in breaking_news
+                if news_item.get('article_ID')
+            ]
+        logger.error(
+            '%s: изменился формат данных на странице %s', __name__, self.URL
+        )
+        return []
+
+    def news_item(self, news_item: dict) -> dict:
+        title = news_item.get('title')
+        link = news_item.get('href')
+        news_id = news_item.get('article_ID')
+        logger.debug('Found news item - ID: %s title: %s href %s', news_id, title, link)
+        return {
+            'id': news_id,
+            'title': title,
+            'link': f'{urlparse(self.URL).scheme}://{urlparse(self.URL).netloc}{link}',
+            # время публикации: список отсортирован по популярности, а не по времени
+            'ts': parse_timestamp(news_item.get('date'))
+        }
+
+    def get_last_news_item_from_url(self) -> dict:
+        items = self.get_news_items_from_url()
+        return items[0] if items else None
+
 
 def get_article_text(newslink) -> str:
     try:
@@ -254,9 +401,11 @@ def get_article_text(newslink) -> str:
             "user-agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36"
         }
 
-        response = requests.get(newslink, headers=headers, timeout=10)
+        response = engine.get(newslink, headers=headers, timeout=10)
 
         if response.status_code == 200:
+            from bs4 import BeautifulSoup
+
             soup = BeautifulSoup(response.content, 'html.parser')
             article_container = soup.select_one('div:nth-of-type(1) > div:nth-of-type(2) > div:nth-of-type(2) > div:nth-of-type(2) > div:nth-of-type(1) > div > div:nth-of-type(1) > div:nth-of-type(1) > div:nth-of-type(8) > div > div > div')
 
@@ -269,42 +418,41 @@ def get_article_text(newslink) -> str:
                 return article_container.text
         else:
             logger.warning(
-                'Response code = {} on link {}'.format(
-                    response.status_code, newslink
-                )
+                'Response code = %s on link %s', response.status_code, newslink
             )
     except Exception as e:
         logger.error(
-            'Cant retrieve news article  text from {}: {}'.format(
-                newslink, e
-            )
+            'Cant retrieve news article  text from %s: %s', newslink, e
         )
 
 
+def extract_html_text(content) -> str:
+    """HTML параграфов и цитат статьи investing.com или None."""
+    from lxml import html
+
+    tree = html.fromstring(content)
+    # Используем XPath для извлечения нужного блока
+    paragraphs = tree.xpath('//div[@class="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8"]//p | //div[@class="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8"]//blockquote')
+
+    # Формируем HTML-код из извлеченных параграфов
+    article_html = ''.join(html.tostring(p, encoding='unicode') for p in paragraphs)
+
+    if not article_html:
+        return
+    return article_html
+
+
 def get_html_text(newslink) -> str:
     try:
-        response = requests.get(newslink)
+        response = engine.get(newslink)
 
         if response.status_code == 200:
-            tree = html.fromstring(response.content)
-            # Используем XPath для извлечения нужного блока
-            paragraphs = tree.xpath('//div[@class="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8"]//p | //div[@class="article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8"]//blockquote')
-
-            # Формируем HTML-код из извлеченных параграфов
-            article_html = ''.join(html.tostring(p, encoding='unicode') for p in paragraphs)
-
-            if not article_html:
-                return
-            return article_html
+            return extract_html_text(response.content)
         else:
             logger.warning(
-                'Response code = {} on link {}'.format(
-                    response.status_code, newslink
-                )
+                'Response code = %s on link %s', response.status_code, newslink
             )
     except Exception as e:
         logger.error(
-            'Cant retrieve news article  text from {}: {}'.format(
-                newslink, e
-            )
+            'Cant retrieve news article  text from %s: %s', newslink, e
         )
@@ -0,0 +1,56 @@
+import statistics
+
+from bot_app.consts import (
+    POLL_BACKOFF,
+    POLL_MAX_PERIOD,
+    POLL_MIN_PERIOD,
+    POLLS_PER_ITEM
+)
+
+
+class AdaptiveInterval:
+    """
+    Интервал опроса источника по наблюдаемой частоте публикаций.
+
+    Целевой интервал - медианный промежуток между публикациями
+    новостей, делённый на POLLS_PER_ITEM. Пока новостей нет, интервал
+    растёт в POLL_BACKOFF раз, но всегда остаётся в [min_period, max_period].
+    """
+
+    def __init__(
+        self,
+        min_period=POLL_MIN_PERIOD,
+        max_period=POLL_MAX_PERIOD,
+        backoff=POLL_BACKOFF,
+        polls_per_item=POLLS_PER_ITEM
+    ):
+        self.min_period = min_period
+        self.max_period = max(min_period, max_period)
+        self.backoff = backoff
+        self.polls_per_item = polls_per_item
+        self.current = self.min_period
+
+    def _clamp(self, value) -> float:
+        return min(self.max_period, max(self.min_period, value))
+
+    def rate_interval(self, timestamps) -> float:
+        """Интервал по промежуткам между публикациями или None, если их мало."""
+        gaps = [b - a for a, b in zip(timestamps, timestamps[1:]) if b > a]
+        if not gaps:
+            return None
+        return statistics.median(gaps) / self.polls_per_item
+
+    def update(self, new_items: int, timestamps=()) -> float:
+        """Пересчитывает интервал после опроса, нашедшего `new_items` новостей."""
+        target = self.rate_interval(list(timestamps))
+        if new_items:
+            self.current = self._clamp(target if target is not None else self.min_period)
+        else:
+            backed_off = self.current * self.backoff
+            if target is not None:
+                backed_off = max(backed_off, target)
+            self.current = self._clamp(backed_off)
+        return self.current
+
+    def __call__(self) -> float:
+        return self.current
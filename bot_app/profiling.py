@@ -0,0 +1,86 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+from bot_app.consts import PROFILE_DIR, PROFILE_TOP
+from bot_app.log import logger
+
+
+class CycleProfiler:
+    """
+    Профилирует несколько следующих циклов опроса источников.
+
+    Пока профилировщик не взведён через `arm`, `run` вызывает функцию
+    напрямую, поэтому в обычной работе затрат нет. Каждый цикл
+    сохраняется в PROFILE_DIR как .prof для pstats/snakeviz и .txt
+    с топом функций по накопленному времени.
+    """
+
+    def __init__(self, directory=PROFILE_DIR, top=PROFILE_TOP):
+        self.directory = directory
+        self.top = top
+        self.source = None
+        self._remaining = 0
+        self._lock = threading.Lock()
+        # одновременно может работать только один cProfile
+        self._active = threading.Lock()
+
+    @property
+    def armed(self) -> bool:
+        return self._remaining > 0
+
+    def arm(self, cycles=1, source=None):
+        """Профилировать `cycles` следующих циклов, только `source`, если задан."""
+        with self._lock:
+            self._remaining = cycles
+            self.source = source
+        logger.info('Profiling next %s cycles of %s', cycles, source or 'all sources')
+
+    def _take(self, name) -> bool:
+        with self._lock:
+            if self._remaining <= 0 or (self.source and self.source != name):
+                return False
+            if not self._active.acquire(blocking=False):
+                return False
+            self._remaining -= 1
+            return True
+
+    def run(self, name, func, *args, **kwargs):
+        if not self.armed or not self._take(name):
+            return func(*args, **kwargs)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            self._active.release()
+            try:
+                self._save(name, profile, time.perf_counter() - started)
+            except Exception as e:
+                logger.error('Error on saving profile of %s: %s', name, e)
+
+    def _save(self, name, profile: cProfile.Profile, elapsed):
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        path = os.path.join(
+            self.directory,
+            '{}.{:03d}_{}'.format(
+                time.strftime('%Y%m%d-%H%M%S', time.localtime(now)),
+                int(now * 1000) % 1000,
+                name.replace('/', '_')
+            )
+        )
+        profile.dump_stats(path + '.prof')
+
+        summary = io.StringIO()
+        summary.write('{}: {:.3f}s\n\n'.format(name, elapsed))
+        pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(self.top)
+        with open(path + '.txt', 'w', encoding='utf-8') as file:
+            file.write(summary.getvalue())
+        logger.info('Profile of %s (%.3fs) saved to %s.prof', name, elapsed, path)
+
+
+profiler = CycleProfiler()
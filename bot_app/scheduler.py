@@ -0,0 +1,135 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bot_app.consts import SCHEDULER_JITTER, SCHEDULER_WORKERS
+from bot_app.log import logger
+
+
+class Job:
+    """Периодическая задача одного источника."""
+
+    def __init__(self, name, func, interval, args=(), max_concurrency=1):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.args = args
+        self.max_concurrency = max_concurrency
+        self.running = 0
+
+    def next_interval(self) -> float:
+        return self.interval() if callable(self.interval) else self.interval
+
+
+class Scheduler:
+    """
+    Запускает задачи источников по их собственному расписанию
+    в общем ограниченном пуле потоков.
+
+    Медленный источник занимает только свой поток, остальные
+    продолжают опрашиваться вовремя. К каждому запуску добавляется
+    случайный сдвиг, чтобы источники не стартовали одновременно.
+    """
+
+    def __init__(self, max_workers=SCHEDULER_WORKERS, jitter=SCHEDULER_JITTER):
+        self.max_workers = max_workers
+        self.jitter = jitter
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._executor = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _jitter(self, interval) -> float:
+        return random.uniform(0, self.jitter * interval)
+
+    def _push(self, ts, job: Job):
+        heapq.heappush(self._heap, (ts, next(self._counter), job))
+
+    def add_job(self, name, func, interval, args=(), max_concurrency=1, delay=0):
+        job = Job(name, func, interval, args, max_concurrency)
+        with self._lock:
+            self._push(
+                time.monotonic() + delay + self._jitter(job.next_interval()),
+                job
+            )
+        return job
+
+    def _execute(self, job: Job):
+        if self._stop.is_set():
+            with self._lock:
+                job.running -= 1
+            return
+        started_ts = time.monotonic()
+        try:
+            job.func(*job.args)
+        except Exception as e:
+            logger.exception('Job %s failed: %s', job.name, e)
+        finally:
+            with self._lock:
+                job.running -= 1
+                if callable(job.interval):
+                    self._reschedule(job, started_ts)
+            self._wake.set()
+
+    def _reschedule(self, job: Job, started_ts):
+        """Переносит следующий запуск с учётом интервала, пересчитанного задачей."""
+        interval = job.next_interval()
+        ts = started_ts + interval + self._jitter(interval)
+        self._heap = [
+            (ts if item is job else item_ts, count, item)
+            for item_ts, count, item in self._heap
+        ]
+        heapq.heapify(self._heap)
+
+    def _submit_due(self) -> float:
+        """Запускает созревшие задачи, возвращает время до следующей."""
+        now = time.monotonic()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                _, _, job = heapq.heappop(self._heap)
+                interval = job.next_interval()
+                self._push(now + interval + self._jitter(interval), job)
+                if job.running >= job.max_concurrency:
+                    logger.info('Job %s is still running, skipping this run', job.name)
+                    continue
+                job.running += 1
+                self._executor.submit(self._execute, job)
+            if not self._heap:
+                return None
+            return max(0, self._heap[0][0] - now)
+
+    def run(self):
+        """Крутит расписание до вызова `stop()`."""
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix='source'
+        )
+        try:
+            while not self._stop.is_set():
+                self._wake.clear()
+                timeout = self._submit_due()
+                self._wake.wait(timeout)
+        finally:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def wake(self, run_now=False):
+        """Будит цикл; с `run_now` все задачи запускаются немедленно."""
+        if run_now:
+            now = time.monotonic()
+            with self._lock:
+                self._heap = [(now, count, job) for _, count, job in self._heap]
+                heapq.heapify(self._heap)
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def join(self):
+        """Ждёт задачи, запущенные до `stop()`."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -5,25 +5,29 @@ from contextlib import contextmanager
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chrome.options import Options as ChromeOptions
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import (
+    SessionNotCreatedException,
+    TimeoutException,
+    WebDriverException
+)
 from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
 
 from selenium_stealth import stealth
 
+from bot_app.consts import LEAN_BLOCKED_URLS
+from bot_app.drivers import forget_driver, resolve_driver
+
 
 logger = logging.getLogger(__name__)
 caps = DesiredCapabilities.CHROME
 caps['goog:loggingPrefs'] = {'performance': 'ALL'}
 
 
-@contextmanager
-def selenium_driver(retries=1, delay=5) -> webdriver.Chrome:
+def chrome_options(lean=False) -> ChromeOptions:
     """
-    Контекстный менеджер для управления драйвером Selenium с поддержкой повторных попыток.
+    Опции headless Chrome, общие для всех драйверов.
 
-    :param retries: Количество попыток.
-    :param delay: Задержка между попытками (в секундах).
+    :param lean: Не грузить картинки и не ждать полной загрузки страницы.
     """
     options = ChromeOptions()
     # options.add_argument('--ignore-certificate-errors')
@@ -41,30 +45,72 @@ def selenium_driver(retries=1, delay=5) -> webdriver.Chrome:
     options.add_experimental_option("excludeSwitches", ["enable-automation"])
     options.add_experimental_option('useAutomationExtension', False)
 
+    if lean:
+        # отдаём управление после DOMContentLoaded, без картинок
+        options.page_load_strategy = 'eager'
+        options.add_experimental_option(
+            'prefs', {'profile.managed_default_content_settings.images': 2}
+        )
+    return options
+
+
+def create_driver(lean=False) -> webdriver.Chrome:
+    """
+    Запускает headless Chrome и применяет к нему stealth.
+
+    :param lean: Блокировать шрифты, медиа и трекеры из LEAN_BLOCKED_URLS.
+    """
+    try:
+        driver = webdriver.Chrome(
+            service=ChromeService(resolve_driver('chromedriver')),
+            options=chrome_options(lean)
+        )
+    except SessionNotCreatedException:
+        # обычно Chrome обновился, а драйвер остался от старой версии
+        forget_driver('chromedriver')
+        driver = webdriver.Chrome(
+            service=ChromeService(resolve_driver('chromedriver')),
+            options=chrome_options(lean)
+        )
+    driver.implicitly_wait(2)  # Устанавливаем неявное ожидание
+    stealth(
+        driver,
+        languages=["ru-RU", "RU"],
+        vendor="Google Inc.",
+        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+        platform="Win32",
+        webgl_vendor="Intel Inc.",
+        renderer="Intel Iris OpenGL Engine",
+        fix_hairline=True,
+    )
+    if lean:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd(
+            'Network.setBlockedURLs', {'urls': LEAN_BLOCKED_URLS}
+        )
+    return driver
+
+
+@contextmanager
+def selenium_driver(retries=1, delay=5) -> webdriver.Chrome:
+    """
+    Контекстный менеджер для управления драйвером Selenium с поддержкой повторных попыток.
+
+    :param retries: Количество попыток.
+    :param delay: Задержка между попытками (в секундах).
+    """
     driver = None
     exc = None
     for attempt in range(retries):
         try:
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
-            driver.implicitly_wait(2)  # Устанавливаем неявное ожидание
-            stealth(
-                driver,
-                languages=["ru-RU", "RU"],
-                vendor="Google Inc.",
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                platform="Win32",
-                webgl_vendor="Intel Inc.",
-                renderer="Intel Iris OpenGL Engine",
-                fix_hairline=True,
-            )
+            driver = create_driver()
             yield driver  # Возвращаем драйвер
             break  # Успешное выполнение, выходим из цикла
         except (TimeoutException, WebDriverException) as e:
             exc = e
-            logger.warning(f"Попытка {attempt + 1} из {retries} не удалась: {e}")
+            logger.warning('Попытка %s из %s не удалась: %s', attempt + 1, retries, e)
             if attempt == retries - 1:  # Если это последняя попытка
-                logger.error(f"Все попытки завершились ошибкой: {e}")
+                logger.error('Все попытки завершились ошибкой: %s', e)
                 raise
             time.sleep(delay)  # Ждем перед следующей попыткой
         finally:
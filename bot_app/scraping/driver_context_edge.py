@@ -6,10 +6,14 @@ from selenium import webdriver
 from selenium.webdriver.edge.service import Service as EdgeService
 from selenium.webdriver.edge.options import Options as EdgeOptions
 from selenium.webdriver.edge.webdriver import WebDriver as EdgeWebDriver
-from selenium.common.exceptions import TimeoutException, WebDriverException
+from selenium.common.exceptions import (
+    SessionNotCreatedException,
+    TimeoutException,
+    WebDriverException
+)
 
 
-from bot_app.drivers import DRIVERS
+from bot_app.drivers import forget_driver, resolve_driver
 
 
 logger = logging.getLogger(__name__)
@@ -36,8 +40,7 @@ def selenium_driver(retries=3, delay=60) -> webdriver.Edge:
     exc = None
     for attempt in range(retries):
         try:
-            # Установка EdgeDriver через webdriver_manager
-            service = EdgeService(executable_path=DRIVERS.get('msedgedriver'), options=options)
+            service = EdgeService(executable_path=resolve_driver('msedgedriver'), options=options)
             driver = EdgeWebDriver(service=service, options=options)
 
             driver.implicitly_wait(60)  # Увеличено время неявного ожидания
@@ -45,9 +48,12 @@ def selenium_driver(retries=3, delay=60) -> webdriver.Edge:
             break  # Успешное выполнение, выходим из цикла
         except (TimeoutException, WebDriverException) as e:
             exc = e
-            logger.warning(f"Попытка {attempt + 1} из {retries} не удалась: {e}")
+            logger.warning('Попытка %s из %s не удалась: %s', attempt + 1, retries, e)
+            if isinstance(e, SessionNotCreatedException):
+                # Edge обновился: следующая попытка возьмёт свежий драйвер
+                forget_driver('msedgedriver')
             if attempt == retries - 1:  # Если это последняя попытка
-                logger.error(f"Все попытки завершились ошибкой: {e}")
+                logger.error('Все попытки завершились ошибкой: %s', e)
                 raise
             time.sleep(delay)  # Ждем перед следующей попыткой
         finally:
@@ -6,7 +6,8 @@ from selenium import webdriver
 from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.firefox.service import Service as FirefoxService
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
-from webdriver_manager.firefox import GeckoDriverManager
+
+from bot_app.drivers import resolve_driver
 
 
 logger = logging.getLogger(__name__)
@@ -31,9 +32,8 @@ def selenium_driver_firefox(retries=1, delay=5) -> webdriver.Firefox:
     exc = None
     for attempt in range(retries):
         try:
-            # Установка GeckoDriver через webdriver_manager
             service = FirefoxService(
-                GeckoDriverManager().install(),
+                resolve_driver('geckodriver'),
                 service_args=['--marionette-port', '2828', '--connect-existing'],
                 log_path='geckodriver.log'
             )
@@ -43,9 +43,9 @@ def selenium_driver_firefox(retries=1, delay=5) -> webdriver.Firefox:
             break  # Успешное выполнение, выходим из цикла
         except (TimeoutException, WebDriverException) as e:
             exc = e
-            logger.warning(f"Попытка {attempt + 1} из {retries} не удалась: {e}")
+            logger.warning('Попытка %s из %s не удалась: %s', attempt + 1, retries, e)
             if attempt == retries - 1:  # Если это последняя попытка
-                logger.error(f"Все попытки завершились ошибкой: {e}")
+                logger.error('Все попытки завершились ошибкой: %s', e)
                 raise
             time.sleep(delay)  # Ждем перед следующей попыткой
         finally:
@@ -0,0 +1,228 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import partial
+
+from selenium.common.exceptions import WebDriverException
+
+from bot_app.consts import (
+    DRIVER_CHECKOUT_TIMEOUT,
+    DRIVER_MAX_AGE,
+    DRIVER_MAX_USES,
+    DRIVER_POOL_SIZE
+)
+from bot_app.metrics import registry, stage
+from bot_app.scraping.driver_context_chrome import create_driver
+
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """Драйвер из пула вместе с его возрастом и числом использований."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.created_ts = time.monotonic()
+        self.uses = 0
+
+
+class DriverPool:
+    """
+    Пул заранее запущенных драйверов Selenium.
+
+    Драйвер берётся из пула через `driver()` и возвращается обратно
+    после использования. Сломанные, старые и слишком часто
+    использованные драйверы закрываются и пересоздаются.
+    """
+
+    def __init__(
+        self,
+        factory,
+        name='chrome',
+        size=DRIVER_POOL_SIZE,
+        max_uses=DRIVER_MAX_USES,
+        max_age=DRIVER_MAX_AGE,
+        retries=3,
+        delay=5
+    ):
+        self.factory = factory
+        self.name = name
+        self.size = size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.retries = retries
+        self.delay = delay
+        self._idle = deque()
+        self._in_use = set()
+        self._created = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _create(self) -> PooledDriver:
+        for attempt in range(self.retries):
+            try:
+                with stage('browser_startup', self.name):
+                    return PooledDriver(self.factory())
+            except WebDriverException as e:
+                logger.warning(
+                    'Попытка %s из %s запустить драйвер не удалась: %s',
+                    attempt + 1, self.retries, e
+                )
+                if attempt == self.retries - 1:
+                    raise
+                time.sleep(self.delay)
+
+    @staticmethod
+    def _quit(pooled: PooledDriver):
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning('Ошибка при закрытии драйвера: %s', e)
+
+    def _expired(self, pooled: PooledDriver) -> bool:
+        return (
+            pooled.uses >= self.max_uses
+            or time.monotonic() - pooled.created_ts > self.max_age
+        )
+
+    @staticmethod
+    def _healthy(pooled: PooledDriver) -> bool:
+        try:
+            pooled.driver.execute_script('return 1')
+            return True
+        except Exception as e:
+            logger.warning('Драйвер не прошёл проверку, пересоздаём: %s', e)
+            return False
+
+    def _discard(self, pooled: PooledDriver):
+        self._quit(pooled)
+        with self._cond:
+            self._created -= 1
+            self._cond.notify()
+
+    def checkout(self, timeout=DRIVER_CHECKOUT_TIMEOUT) -> PooledDriver:
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise RuntimeError('Пул драйверов закрыт')
+                pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    if self._created < self.size:
+                        self._created += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError('Нет свободных драйверов в пуле')
+                    self._cond.wait(remaining)
+                    continue
+            if not self._expired(pooled) and self._healthy(pooled):
+                with self._cond:
+                    self._in_use.add(pooled)
+                return pooled
+            self._discard(pooled)
+
+        try:
+            pooled = self._create()
+            with self._cond:
+                self._in_use.add(pooled)
+            return pooled
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def checkin(self, pooled: PooledDriver, broken=False):
+        pooled.uses += 1
+        with self._cond:
+            if pooled not in self._in_use:
+                # драйвер уже закрыт принудительно в close(force=True)
+                return
+            self._in_use.discard(pooled)
+            keep = not (broken or self._closed or self._expired(pooled))
+            if keep:
+                self._idle.append(pooled)
+                self._cond.notify()
+                return
+        self._discard(pooled)
+
+    @contextmanager
+    def driver(self):
+        """Берёт драйвер из пула на время блока `with`."""
+        pooled = self.checkout()
+        broken = False
+        try:
+            yield pooled.driver
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(pooled, broken=broken)
+
+    def warm(self, count=None):
+        """Заранее запускает драйверы, чтобы первый цикл не ждал браузер."""
+        count = self.size if count is None else min(count, self.size)
+        while True:
+            with self._cond:
+                if self._closed or self._created >= count:
+                    return
+                self._created += 1
+            try:
+                pooled = self._create()
+            except Exception as e:
+                logger.error('Не удалось прогреть пул драйверов: %s', e)
+                with self._cond:
+                    self._created -= 1
+                return
+            with self._cond:
+                self._idle.append(pooled)
+                self._cond.notify()
+
+    def open(self):
+        """Снова разрешает выдачу драйверов после `close()`."""
+        with self._cond:
+            self._closed = False
+
+    def close(self, force=False):
+        """
+        Закрывает свободные драйверы, занятые закроются при возврате.
+        С `force` занятые драйверы закрываются сразу, прерывая их запросы.
+        """
+        with self._cond:
+            self._closed = True
+            drivers = list(self._idle)
+            self._idle.clear()
+            if force:
+                drivers.extend(self._in_use)
+                self._in_use.clear()
+            self._created -= len(drivers)
+            self._cond.notify_all()
+        for pooled in drivers:
+            self._quit(pooled)
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'idle': len(self._idle),
+                'in_use': len(self._in_use)
+            }
+
+
+driver_pool = DriverPool(create_driver)
+lean_driver_pool = DriverPool(partial(create_driver, lean=True), name='chrome_lean')
+
+registry.callback(
+    'driver_pool_drivers',
+    'Драйверы Selenium в пулах по состоянию',
+    lambda: [
+        ({'pool': pool.name, 'state': state}, value)
+        for pool in (driver_pool, lean_driver_pool)
+        for state, value in pool.stats().items()
+    ]
+)
@@ -2,61 +2,148 @@
 
 import logging
 
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException
-from bs4 import BeautifulSoup
-
-from bot_app.parsers import AbstractParser
-from bot_app.scraping.driver_context_chrome import selenium_driver
+from bot_app.consts import LEAN_RENDER_SOURCES
+from bot_app.exceptions import HTMLError
+from bot_app.metrics import stage
+from bot_app.parsers import InvestingParser
+from bot_app.tiered import check_response, tiered_fetcher
 
 
 logger = logging.getLogger(__name__)
 
 
-class InvestingParserSelenium(AbstractParser):
+class InvestingParserSelenium(InvestingParser):
     __name__ = 'investing.com_parser_selenium'
     URL = 'https://ru.investing.com/news/most-popular-news'
-    xpath = '/html/body/div[1]/div[2]/div[2]/div[2]/div[1]/div/div/ul/li[1]/article/div/a'
+    xpath = '/html/body/div[1]/div[2]/div[2]/div[2]/div[1]/div/div/ul/li/article/div/a'
 
-    def __init__(self):
-        super().__init__()
+    # облегчённый рендер: eager-загрузка без картинок, шрифтов и трекеров
+    lean_render = False
+    # сначала HTTP, браузер - только если HTTP не справился
+    tiered = True
 
-    def get_last_news_item_from_url(self, retries=3) -> dict:
-        with selenium_driver() as driver:
+    def __init__(self, lean_render=None, tiered=None):
+        super().__init__()
+        if lean_render is not None:
+            self.lean_render = lean_render
+        elif self.__name__ in LEAN_RENDER_SOURCES:
+            self.lean_render = True
+        if tiered is not None:
+            self.tiered = tiered
+        self._pool = None
+
+    @property
+    def pool(self):
+        # Selenium и пул драйверов импортируются, когда браузер впервые нужен
+        if self._pool is None:
+            from bot_app.scraping.driver_pool import driver_pool, lean_driver_pool
+            self._pool = lean_driver_pool if self.lean_render else driver_pool
+        return self._pool
+
+    def warm_up(self):
+        if self.tiered:
+            # при многоуровневой загрузке браузер нужен редко, запустим по требованию;
+            # пул, закрытый прошлой остановкой, снова открываем
+            if self._pool is not None:
+                self._pool.open()
+            return
+        self.pool.open()
+        self.pool.warm()
+
+    def shutdown(self, force=False):
+        if self._pool is not None:
+            self._pool.close(force=force)
+
+    def wait_for(self, driver, by, selector, timeout=60):
+        """Ждёт элемент; в облегчённом режиме после этого останавливает загрузку."""
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        element = WebDriverWait(driver, timeout).until(
+            EC.presence_of_element_located((by, selector))
+        )
+        if self.lean_render:
+            driver.execute_script('window.stop();')
+        return element
+
+    def get_news_items_from_url(self, retries=3) -> list:
+        if not self.tiered:
+            return self.get_news_items_browser(retries=retries)
+        return tiered_fetcher.run(
+            self.URL,
+            super().get_news_items_from_url,
+            lambda: self.get_news_items_browser(retries=retries)
+        )
+
+    def get_news_items_browser(self, retries=3) -> list:
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        with self.pool.driver() as driver:
             for attempt in range(retries):
                 try:
-                    driver.get(self.URL)
-                    WebDriverWait(driver, 60).until(
-                        EC.presence_of_element_located((By.TAG_NAME, 'body'))
-                    )
-                    news_element = WebDriverWait(driver, 60).until(
-                        EC.presence_of_element_located((By.XPATH, self.xpath))
-                    )
-
-                    if news_element:
-                        title = news_element.text
-                        link = news_element.get_attribute('href')
-                        news_id = link.split('-')[-1]
-
-                        if title and link and news_id:
-                            logger.debug(f'Found news item - ID: {news_id}, title: {title}, href: {link}')
-                            return {
-                                'id': news_id,
-                                'title': title,
-                                'link': link
-                            }
-                    else:
-                        logger.error(f'{self.__name__}: не удалось найти элементы новостей на странице {self.URL}')
+                    with stage('listing_fetch', self.__name__):
+                        driver.get(self.URL)
+                        WebDriverWait(driver, 60).until(
+                            EC.presence_of_element_located((By.TAG_NAME, 'body'))
+                        )
+                        self.wait_for(driver, By.XPATH, self.xpath)
+                    with stage('listing_parse', self.__name__):
+                        news_elements = driver.find_elements(By.XPATH, self.xpath)
+
+                        items = []
+                        for news_element in news_elements:
+                            title = news_element.text
+                            link = news_element.get_attribute('href')
+                            news_id = link.split('-')[-1] if link else None
+
+                            if title and link and news_id:
+                                logger.debug('Found news item - ID: %s, title: %s, href: %s', news_id, title, link)
+                                items.append({
+                                    'id': news_id,
+                                    'title': title,
+                                    'link': link
+                                })
+                    if items:
+                        ids = ','.join(str(item['id']) for item in items)
+                        if not self.fragment_changed(ids):
+                            return []
+                        return items
+                    logger.error('%s: не удалось найти элементы новостей на странице %s', self.__name__, self.URL)
                 except Exception as e:
-                    logger.error(f"Ошибка при парсинге: {e}")
-            return None
+                    logger.error('Ошибка при парсинге: %s', e)
+            return []
 
-    @staticmethod
-    def get_article_text_selenium(newslink) -> str:
-        logger.info('Trying to get article text from {}'.format(newslink))
-        with selenium_driver() as driver:
+    def get_last_news_item_from_url(self, retries=3) -> dict:
+        items = self.get_news_items_from_url(retries=retries)
+        return items[0] if items else None
+
+    def get_article_text_selenium(self, newslink) -> str:
+        if not self.tiered:
+            return self.get_article_text_browser(newslink)
+        return tiered_fetcher.run(
+            newslink,
+            lambda: self.get_article_text_http(newslink),
+            lambda: self.get_article_text_browser(newslink)
+        )
+
+    def get_article_text_http(self, newslink) -> str:
+        response = self.fetch(newslink)
+        check_response(response)
+        if response.status_code != 200:
+            raise HTMLError(f'{newslink}: {response.status_code}')
+        with stage('text_extraction', self.__name__):
+            return extract_article_text(response.content, newslink) or None
+
+    def get_article_text_browser(self, newslink) -> str:
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        logger.info('Trying to get article text from %s', newslink)
+        with self.pool.driver() as driver:
             try:
                 driver.get(newslink)
                 try:
@@ -68,11 +155,7 @@ class InvestingParserSelenium(AbstractParser):
                     logger.info('Timeout on waiting for body')
                     raise
                 try:
-                    WebDriverWait(driver, 60).until(
-                        EC.presence_of_element_located(
-                            (By.CSS_SELECTOR, '#article > div > div')
-                        )
-                    )
+                    self.wait_for(driver, By.CSS_SELECTOR, '#article > div > div')
                 except TimeoutException:
                     logger.error(
                         'Failed on waiting for #article > div > div'
@@ -80,72 +163,77 @@ class InvestingParserSelenium(AbstractParser):
                     pass
 
                 # Получение HTML-кода страницы
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                article_container = soup.select_one('#article > div > div')
-
-                if not article_container:
-                    logger.warning(
-                        'Не найден CSS селектор #article > div > div по ссылке {}'.format(newslink)
-                    )
-                    article_container = soup.select_one('article')
-                    if not article_container:
-                        logger.warning('Не найден CSS селектор article')
-                        article_container = soup.select_one('div.article-content')
-                        if not article_container:
-                            logger.error('Вообще никакой CSS селектор не найден')
-                            return ""
-
-                # Извлечение текста из всех тегов <p> внутри article_container
-                paragraphs = article_container.find_all('p')
-
-                # Инициализация переменных для фильтрации
-                start_index = None
-                end_index = None
-
-                # Поиск индексов начала и конца
-                for index, p in enumerate(paragraphs):
-                    text = p.get_text(strip=True)  # Убираем лишние пробелы
-
-                    # Ищем начало (первый параграф после 'Позиция успешно добавлена')
-                    if 'Позиция успешно добавлена' in text:
-                        start_index = index + 1  # Начинаем со следующего параграфа
-
-                    # Ищем конец (параграф с 'Читайте оригинальную статью на сайте')
-                    if 'Читайте оригинальную статью на сайте' in text:
-                        end_index = index  # Заканчиваем на текущем параграфе
-                        break  # Прерываем цикл, так как конец найден
-
-                # Если начало и конец найдены, извлекаем текст между ними
-                if start_index is not None and end_index is not None:
-                    article_text = '\n\n'.join(
-                        [p.get_text(strip=True) for p in paragraphs[start_index:end_index]]
-                    )
-                else:
-                    # Если начало или конец не найдены, берем все параграфы
-                    article_text = '\n\n'.join([p.get_text(strip=True) for p in paragraphs])
-
-                # Обрезка текста (удаление дефиса в начале, если есть)
-                cut_index = article_text[:30].find('-')
-                if cut_index != -1:
-                    article_text = article_text[cut_index + 1:]
-
-                # Обрезка текста (удаление дефиса в начале, если есть)
-                # cut_index = article_text[:30].find('-')
-                # if cut_index:
-                #     article_text = article_text[cut_index + 1:]
-
-                # Обрезка текста до 2000 символов, если он слишком длинный
-                logger.info(
-                    'Successfully got article text from {}'.format(newslink)
-                )
-                if len(article_container.text) > 2000:
-                    return f'{article_text[:2000]}...\n'
-                else:
-                    return article_text
+                page_source = driver.page_source
+                with stage('text_extraction', self.__name__):
+                    return extract_article_text(page_source, newslink)
 
             except ValueError as e:
                 logger.error(
-                    'Не удалось получить текст статьи с {}: {}'.format(
-                        newslink, e
-                    )
+                    'Не удалось получить текст статьи с %s: %s', newslink, e
                 )
+
+
+def extract_article_text(page_source, newslink='') -> str:
+    """Текст статьи investing.com из HTML страницы."""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(page_source, 'html.parser')
+    article_container = soup.select_one('#article > div > div')
+
+    if not article_container:
+        logger.warning(
+            'Не найден CSS селектор #article > div > div по ссылке %s', newslink
+        )
+        article_container = soup.select_one('article')
+        if not article_container:
+            logger.warning('Не найден CSS селектор article')
+            article_container = soup.select_one('div.article-content')
+            if not article_container:
+                logger.error('Вообще никакой CSS селектор не найден')
+                return ""
+
+    # Извлечение текста из всех тегов <p> внутри article_container
+    paragraphs = article_container.find_all('p')
+
+    # Инициализация переменных для фильтрации
+    start_index = None
+    end_index = None
+
+    # Поиск индексов начала и конца
+    for index, p in enumerate(paragraphs):
+        text = p.get_text(strip=True)  # Убираем лишние пробелы
+
+        # Ищем начало (первый параграф после 'Позиция успешно добавлена')
+        if 'Позиция успешно добавлена' in text:
+            start_index = index + 1  # Начинаем со следующего параграфа
+
+        # Ищем конец (параграф с 'Читайте оригинальную статью на сайте')
+        if 'Читайте оригинальную статью на сайте' in text:
+            end_index = index  # Заканчиваем на текущем параграфе
+            break  # Прерываем цикл, так как конец найден
+
+    # Если начало и конец найдены, извлекаем текст между ними
+    if start_index is not None and end_index is not None:
+        article_text = '\n\n'.join(
+            [p.get_text(strip=True) for p in paragraphs[start_index:end_index]]
+        )
+    else:
+        # Если начало или конец не найдены, берем все параграфы
+        article_text = '\n\n'.join([p.get_text(strip=True) for p in paragraphs])
+
+    # Обрезка текста (удаление дефиса в начале, если есть)
+    cut_index = article_text[:30].find('-')
+    if cut_index != -1:
+        article_text = article_text[cut_index + 1:]
+
+    # Обрезка текста (удаление дефиса в начале, если есть)
+    # cut_index = article_text[:30].find('-')
+    # if cut_index:
+    #     article_text = article_text[cut_index + 1:]
+
+    # Обрезка текста до 2000 символов, если он слишком длинный
+    logger.info('Successfully got article text from %s', newslink)
+    if len(article_container.text) > 2000:
+        return f'{article_text[:2000]}...\n'
+    else:
+        return article_text
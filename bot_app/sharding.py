@@ -0,0 +1,433 @@
+"""
+Распределение источников по процессам-воркерам.
+
+Воркеры опрашивают свои источники и готовят текст статей, а найденные
+новости отправляют в общую очередь. Главный процесс проверяет дубли,
+отправляет новости в Telegram и сообщает воркеру результат.
+
+Воркеры на других машинах подключаются к главному процессу по сети:
+
+    python -m bot_app.sharding HOST:PORT bot_app.parsers:RBCParser
+"""
+import importlib
+import multiprocessing
+import queue
+import threading
+import time
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+
+from telebot import formatting
+
+from bot_app.consts import PERIOD, SHARD_AUTHKEY, SHARD_HANDOFF_SIZE, SHARD_STOP_TIMEOUT
+from bot_app.dedup import near_duplicates
+from bot_app.dispatcher import OutboundDispatcher, OutboundMessage
+from bot_app.log import forward_to, listen, logger
+from bot_app.metrics import news_items, registry, stage
+from bot_app.outbox import DROPPED, OutboxEntry, outbox
+from bot_app.scheduler import Scheduler
+from bot_app.storage import seen_store
+
+
+# команда воркеру в очереди подтверждений: опросить источники сейчас
+POLL_NOW = ('poll_now',)
+
+
+def load_parser(path):
+    """Класс парсера по пути 'module:ClassName'."""
+    module_name, _, class_name = path.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def parser_name(parser_class) -> str:
+    """
+    Имя источника, заданное атрибутом `__name__` в теле класса.
+    У самого класса `__name__` - это имя класса, поэтому ищем по MRO.
+    """
+    for cls in parser_class.__mro__:
+        if '__name__' in cls.__dict__ and isinstance(cls.__dict__['__name__'], str):
+            return cls.__dict__['__name__']
+    return parser_class.__name__
+
+
+class ShardWorker:
+    """Опрашивает свои источники и передаёт найденные новости в `items`."""
+
+    def __init__(self, worker_id, parser_paths, items, acks, stop_event):
+        self.worker_id = worker_id
+        self.parsers = {}
+        for path in parser_paths:
+            parser = load_parser(path)()
+            self.parsers[parser.__name__] = parser
+        self.items = items
+        self.acks = acks
+        self.stop_event = stop_event
+        # новости, переданные главному процессу и ещё не подтверждённые
+        self.handed_off = OrderedDict()
+        self.scheduler = Scheduler()
+        self._lock = threading.Lock()
+
+    def process_source(self, parser):
+        parser.get_last_news_object()
+        for news_object in list(parser.deque):
+            if self.stop_event.is_set():
+                return
+            key = (parser.__name__, str(news_object.get('id')))
+            with self._lock:
+                if key in self.handed_off:
+                    continue
+            text = parser.get_article(news_object['link'])
+            if not text:
+                logger.error('Пустой текст статьи с %s', news_object['link'])
+                continue
+            with self._lock:
+                self.handed_off[key] = news_object
+                while len(self.handed_off) > SHARD_HANDOFF_SIZE:
+                    self.handed_off.popitem(last=False)
+            self.items.put({
+                'worker': self.worker_id,
+                'source': parser.__name__,
+                'id': news_object.get('id'),
+                'title': news_object.get('title'),
+                'lead': news_object.get('lead'),
+                'link': news_object.get('link'),
+                'text': text,
+            })
+
+    def _read_acks(self):
+        while not self.stop_event.is_set():
+            try:
+                message = self.acks.get(timeout=1)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                return
+            if tuple(message) == POLL_NOW:
+                self.scheduler.wake(run_now=True)
+                continue
+            source, news_id, delivered = message
+            with self._lock:
+                news_object = self.handed_off.pop((source, str(news_id)), None)
+            parser = self.parsers.get(source)
+            if parser is None or not delivered:
+                # не отправленная новость уйдёт снова в следующем цикле
+                continue
+            if news_object in parser.deque:
+                parser.deque.remove(news_object)
+            # в базу ID уже записал главный процесс
+            parser.seen.remember(source, news_id)
+            parser.record_published(news_id)
+
+    def _wait_stop(self):
+        self.stop_event.wait()
+        self.scheduler.stop()
+        # процесс сейчас завершится: браузеры закрываем сразу,
+        # не дожидаясь текущих запросов, чтобы не осталось chromedriver
+        for parser in self.parsers.values():
+            parser.shutdown(force=True)
+
+    def run(self):
+        scheduler = self.scheduler
+        threading.Thread(target=self._read_acks, daemon=True).start()
+        threading.Thread(target=self._wait_stop, daemon=True).start()
+        try:
+            for parser in self.parsers.values():
+                parser.warm_up()
+            for parser in self.parsers.values():
+                scheduler.add_job(
+                    parser.__name__,
+                    self.process_source,
+                    parser.poll_interval,
+                    args=(parser,),
+                    max_concurrency=parser.max_concurrency
+                )
+            scheduler.run()
+        finally:
+            for parser in self.parsers.values():
+                parser.shutdown()
+
+
+def worker_main(worker_id, parser_paths, items, acks, stop_event, log_queue=None):
+    """Точка входа процесса-воркера."""
+    if log_queue is not None:
+        forward_to(log_queue)
+    logger.info('Shard worker %s started with %s', worker_id, parser_paths)
+    ShardWorker(worker_id, parser_paths, items, acks, stop_event).run()
+    logger.info('Shard worker %s stopped', worker_id)
+
+
+class ShardManager(BaseManager):
+    """Доступ к очередям главного процесса для воркеров на других машинах."""
+
+
+class ShardedNewsParser:
+    """
+    Замена NewsParser, которая раскладывает источники по `workers`
+    процессам по кругу. С тем же интерфейсом запуска и остановки,
+    поэтому команды бота работают без изменений.
+    """
+
+    def __init__(
+        self, parser_paths, workers, dispatcher: OutboundDispatcher, chat_id,
+        address=None
+    ):
+        self.parser_paths = list(parser_paths)
+        self.workers = max(1, min(workers, len(self.parser_paths)))
+        self.dispatcher = dispatcher
+        self.chat_id = chat_id
+        self.address = address
+        self.seen = seen_store
+        self.context = multiprocessing.get_context('spawn')
+        self.start_ts = None
+        self.thread: threading.Thread = None
+        self.processes = []
+        self.inflight = set()
+        self.stop_event = self.context.Event()
+        self.items = self.context.Queue()
+        self.acks = {}
+        self.log_queue = self.context.Queue()
+        self._log_listener = None
+        self._manager = None
+        registry.callback(
+            'shard_workers_alive',
+            'Живые процессы-воркеры',
+            lambda: [({}, sum(process.is_alive() for process in self.processes))]
+        )
+        registry.callback(
+            'news_inflight',
+            'Новости, переданные диспетчеру и ещё не доставленные',
+            lambda: [({}, len(self.inflight))]
+        )
+
+    def sources(self) -> list:
+        return [
+            (parser_name(cls), cls.URL)
+            for cls in map(load_parser, self.parser_paths)
+        ]
+
+    def _ack_queue(self, worker_id):
+        if worker_id not in self.acks:
+            self.acks[worker_id] = self.context.Queue()
+        return self.acks[worker_id]
+
+    def _serve(self):
+        """Открывает очереди для удалённых воркеров по адресу `address`."""
+        if not SHARD_AUTHKEY:
+            logger.error('SHARD_AUTHKEY is not set, remote workers are disabled')
+            return
+        ShardManager.register('items', callable=lambda: self.items)
+        ShardManager.register('acks', callable=self._ack_queue)
+        ShardManager.register('stop_event', callable=lambda: self.stop_event)
+        self._manager = ShardManager(address=self.address, authkey=SHARD_AUTHKEY)
+        server = self._manager.get_server()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info('Shard queues are served on %s:%s', *self.address)
+
+    def _spawn(self):
+        self.processes = []
+        for worker_id in range(self.workers):
+            process = self.context.Process(
+                target=worker_main,
+                args=(
+                    worker_id,
+                    self.parser_paths[worker_id::self.workers],
+                    self.items,
+                    self._ack_queue(worker_id),
+                    self.stop_event,
+                    self.log_queue
+                ),
+                name=f'shard-{worker_id}',
+                daemon=True
+            )
+            process.start()
+            self.processes.append(process)
+
+    def consume(self):
+        """Принимает новости от воркеров и передаёт их диспетчеру."""
+        while not self.stop_event.is_set():
+            try:
+                item = self.items.get(timeout=1)
+            except queue.Empty:
+                continue
+            key = (item['source'], str(item['id']))
+            if key in self.inflight:
+                continue
+            if self.seen.contains(*key):
+                # уже отправлена в прошлом цикле или другим воркером
+                self._ack(item, delivered=True)
+                continue
+            with stage('dedup_check', item['source']):
+                found = near_duplicates.check(key, item['title'], item.get('lead'))
+            if found is not None and not found[1]:
+                # копия с другого источника ещё отправляется: воркер
+                # пришлёт новость снова в следующем цикле
+                self._ack(item, delivered=False)
+                continue
+            if found is not None:
+                match = found[0]
+                # та же новость с другого источника: статью воркер уже
+                # загрузил, но в Telegram она не уйдёт
+                logger.info(
+                    'Skipping %s from %s: near duplicate of %s from %s',
+                    item['id'], item['source'], match[1], match[0]
+                )
+                self.seen.add(*key)
+                news_items.inc(source=item['source'], event='duplicate')
+                self._ack(item, delivered=True)
+                continue
+            news_items.inc(source=item['source'], event='found')
+            with stage('markdown_escape', item['source']):
+                text = (
+                    f'*{formatting.escape_markdown(item["title"])}*\n\n'
+                    f'{formatting.escape_markdown(item["text"])}\n'
+                    f'[Читать продолжение в источнике]({item["link"]})'
+                )
+            entry = outbox.add(
+                item['source'], item['id'], self.chat_id,
+                {name: item.get(name) for name in ('id', 'title', 'link', 'lead')},
+                text, parse_mode='MarkdownV2'
+            )
+            self.submit(entry, item)
+
+    def submit(self, entry: OutboxEntry, item):
+        self.inflight.add(entry.key)
+        self.dispatcher.submit(
+            OutboundMessage(
+                chat_id=entry.chat_id,
+                text=entry.text,
+                parse_mode=entry.parse_mode,
+                on_success=lambda: self.on_delivered(item),
+                on_failure=lambda e: self.on_failed(item),
+                source=entry.source
+            )
+        )
+
+    def resume_outbox(self):
+        """Отправляет новости, подготовленные до остановки или падения."""
+        for entry in outbox.pending():
+            if entry.key in self.inflight:
+                continue
+            if self.seen.contains(*entry.key):
+                outbox.done(*entry.key)
+                continue
+            found = near_duplicates.check(
+                entry.key, entry.item.get('title'), entry.item.get('lead')
+            )
+            if found is not None:
+                if found[1]:
+                    self.seen.add(*entry.key)
+                    outbox.done(*entry.key, state=DROPPED)
+                continue
+            logger.info('Resuming %s from %s', entry.news_id, entry.source)
+            # воркер, который её нашёл, мог уже смениться, подтверждать некому
+            self.submit(
+                entry,
+                dict(entry.item, worker=None, source=entry.source, id=entry.news_id)
+            )
+
+    def _ack(self, item, delivered):
+        ack_queue = self.acks.get(item['worker'])
+        if ack_queue is not None:
+            ack_queue.put((item['source'], item['id'], delivered))
+
+    def on_delivered(self, item):
+        logger.info('Storing last news item ID: %s for %s', item['id'], item['source'])
+        self.seen.add(item['source'], item['id'])
+        near_duplicates.register(
+            (item['source'], str(item['id'])), item.get('title'), item.get('lead')
+        )
+        outbox.done(item['source'], item['id'])
+        self.inflight.discard((item['source'], str(item['id'])))
+        news_items.inc(source=item['source'], event='posted')
+        self._ack(item, delivered=True)
+
+    def on_failed(self, item):
+        near_duplicates.release((item['source'], str(item['id'])))
+        self.inflight.discard((item['source'], str(item['id'])))
+        news_items.inc(source=item['source'], event='failed')
+        self._ack(item, delivered=False)
+
+    def parse_news(self, delay):
+        logger.info('Delaying parse_news for %s', delay)
+        if self.stop_event.wait(delay):
+            return
+        self._log_listener = listen(self.log_queue)
+        # обычно уже запущен в App.start
+        self.dispatcher.start()
+        try:
+            self.resume_outbox()
+            if self.address and self._manager is None:
+                self._serve()
+            self._spawn()
+            self.consume()
+        finally:
+            for process in self.processes:
+                process.join(SHARD_STOP_TIMEOUT)
+                if process.is_alive():
+                    # крайний случай: браузеры этого воркера могут остаться
+                    logger.warning('Shard worker %s did not stop, terminating', process.name)
+                    process.terminate()
+            # диспетчер досылает подготовленные новости и после /stop
+            self._log_listener.stop()
+            logger.info('parse_news stopped')
+
+    def is_running(self):
+        return (
+            self.thread is not None and self.thread.is_alive()
+            and not self.stop_event.is_set()
+        )
+
+    def is_stopping(self):
+        """
+        После /stop поток ещё ждёт воркеров (до SHARD_STOP_TIMEOUT),
+        и новый запуск невозможен.
+        """
+        return (
+            self.thread is not None and self.thread.is_alive()
+            and self.stop_event.is_set()
+        )
+
+    def start_thread(self, delay):
+        if not self.thread or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self.parse_news, args=(delay,))
+            self.thread.start()
+            self.start_ts = time.monotonic()
+
+    def stop_thread(self, timeout=1, force=False):
+        # воркеры сами закрывают браузеры по stop_event, поэтому `force`
+        # здесь ничего не меняет: terminate оставил бы chromedriver
+        self.stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def poll_now(self):
+        """Просит все воркеры опросить свои источники немедленно."""
+        for ack_queue in list(self.acks.values()):
+            ack_queue.put(POLL_NOW)
+
+    def delay(self):
+        if not self.start_ts:
+            return 0
+        return max(0, PERIOD - (time.monotonic() - self.start_ts))
+
+
+def connect_worker(address, parser_paths, worker_id=None):
+    """Воркер на другой машине: берёт очереди у главного процесса по сети."""
+    ShardManager.register('items')
+    ShardManager.register('acks')
+    ShardManager.register('stop_event')
+    manager = ShardManager(address=address, authkey=SHARD_AUTHKEY)
+    manager.connect()
+    worker_id = worker_id or f'{address[0]}-{time.time_ns()}'
+    worker_main(
+        worker_id, parser_paths,
+        manager.items(), manager.acks(worker_id), manager.stop_event()
+    )
+
+
+if __name__ == '__main__':
+    import sys
+
+    host, _, port = sys.argv[1].rpartition(':')
+    connect_worker((host, int(port)), sys.argv[2:])
@@ -0,0 +1,301 @@
+"""
+Источники новостей, описанные в sources.toml.
+
+Каждая запись задаёт URL, способ загрузки и селекторы списка и статьи.
+Селекторы компилируются в lxml XPath/CSSSelector один раз при загрузке,
+а для каждой записи создаётся класс-наследник ConfiguredParser, поэтому
+источник можно указать по пути импорта, например 'bot_app.sources:rbc'.
+"""
+import json
+import os
+import sys
+import tomllib
+from functools import lru_cache
+from urllib.parse import urljoin
+
+from cssselect import HTMLTranslator
+from lxml import etree, html
+
+from bot_app.consts import LEAN_RENDER_SOURCES, SOURCES_PATH
+from bot_app.exceptions import ChallengeDetected, HTMLBlockNotFound, HTMLError
+from bot_app.log import logger, summarize
+from bot_app.metrics import stage
+from bot_app.next_data import find_next_data, find_value_span
+from bot_app.parsers import AbstractParser
+from bot_app.tiered import check_response, tiered_fetcher
+from bot_app.utils import key_path_cache
+
+
+TIERS = ('http', 'browser', 'tiered')
+LISTINGS = ('html', 'next_data')
+
+
+@lru_cache(maxsize=None)
+def css_to_xpath(css: str) -> str:
+    # перевод CSS в XPath медленнее самой компиляции, а у однотипных
+    # источников селекторы часто совпадают
+    return HTMLTranslator().css_to_xpath(css)
+
+
+class Selector:
+    """Селектор 'css:...' или 'xpath:...', скомпилированный при создании."""
+
+    def __init__(self, expression: str):
+        kind, _, expr = expression.partition(':')
+        if kind == 'css':
+            self.compiled = etree.XPath(css_to_xpath(expr), smart_strings=False)
+        elif kind == 'xpath':
+            self.compiled = etree.XPath(expr, smart_strings=False)
+        else:
+            raise ValueError(f'Неизвестный тип селектора: {expression}')
+        self.expression = expression
+
+    def __call__(self, node) -> list:
+        return self.compiled(node)
+
+    def text(self, node) -> str:
+        """Первое непустое значение: строка атрибута/text() или текст элемента."""
+        for value in self(node):
+            if not isinstance(value, str):
+                value = value.text_content()
+            value = value.strip()
+            if value:
+                return value
+        return None
+
+
+class SourceConfig:
+    """Запись [[source]] из sources.toml с проверенными полями."""
+
+    def __init__(self, entry: dict):
+        try:
+            self.name = entry['name']
+            self.url = entry['url']
+        except KeyError as e:
+            raise ValueError(f'У источника нет поля {e}: {entry}') from None
+        self.enabled = entry.get('enabled', True)
+        self.tier = entry.get('tier', 'tiered')
+        self.listing = entry.get('listing', 'html')
+        if self.tier not in TIERS:
+            raise ValueError(f'{self.name}: tier должен быть одним из {TIERS}')
+        if self.listing not in LISTINGS:
+            raise ValueError(f'{self.name}: listing должен быть одним из {LISTINGS}')
+        self.period = entry.get('period')
+        self.max_length = entry.get('max_length', 2000)
+        # облегчённый рендер в браузере: eager-загрузка без картинок и трекеров
+        self.lean = entry.get('lean', self.name in LEAN_RENDER_SOURCES)
+        # кодировка из записи источника перекрывает <meta charset>, поэтому
+        # задаётся только явно; без неё lxml определяет кодировку сам
+        encoding = entry.get('encoding')
+        self.html_parser = html.HTMLParser(encoding=encoding) if encoding else None
+
+        if self.listing == 'html':
+            self.item = Selector(entry['item'])
+            self.id = Selector(entry['id'])
+            self.title = Selector(entry['title'])
+            self.link = Selector(entry['link'])
+            # лид из списка новостей, по нему и заголовку ищутся дубли
+            self.lead = Selector(entry['lead']) if 'lead' in entry else None
+        else:
+            self.key = entry['key']
+            self.id_field = entry.get('id_field', 'id')
+            self.title_field = entry.get('title_field', 'title')
+            self.link_field = entry.get('link_field', 'link')
+            self.lead_field = entry.get('lead_field')
+        self.article = Selector(entry['article'])
+
+
+class ConfiguredParser(AbstractParser):
+    """Парсер, который всё берёт из SourceConfig в атрибуте `config`."""
+    config: SourceConfig = None
+
+    def __init__(self):
+        if self.config.period:
+            self.period = self.config.period
+        super().__init__()
+
+    def load(self, url, conditional=False) -> bytes:
+        """Страница по способу загрузки источника; None, если не изменилась."""
+        if self.config.tier == 'http':
+            return self.load_http(url, conditional)
+        if self.config.tier == 'browser':
+            return self.load_browser(url)
+        return tiered_fetcher.run(
+            url,
+            lambda: self.load_http(url, conditional) or b'',
+            lambda: self.load_browser(url)
+        )
+
+    def load_http(self, url, conditional=False) -> bytes:
+        response = self.fetch(url, conditional=conditional)
+        if response.status_code == 304:
+            logger.debug('%s not modified', url)
+            return None
+        check_response(response)
+        if response.status_code != 200:
+            raise HTMLError(f'{url}: {response.status_code}')
+        return response.content
+
+    def load_browser(self, url) -> str:
+        # Selenium нужен только источникам с загрузкой через браузер
+        from bot_app.scraping.driver_pool import driver_pool, lean_driver_pool
+
+        pool = lean_driver_pool if self.config.lean else driver_pool
+        with pool.driver() as driver:
+            driver.get(url)
+            return driver.page_source
+
+    def get_news_items_from_url(self) -> list:
+        with stage('listing_fetch', self.__name__):
+            content = self.load(self.URL, conditional=True)
+        if not content:
+            return []
+        with stage('listing_parse', self.__name__):
+            if self.config.listing == 'next_data':
+                return self.parse_next_data(content)
+            return self.parse_html(content)
+
+    def parse_html(self, content) -> list:
+        config = self.config
+        tree = html.fromstring(content, parser=config.html_parser)
+        items = []
+        for node in config.item(tree):
+            news_id = config.id.text(node)
+            title = config.title.text(node)
+            link = config.link.text(node)
+            if news_id and title and link:
+                items.append({
+                    'id': news_id,
+                    'title': title,
+                    'link': urljoin(self.URL, link),
+                    'lead': config.lead.text(node) if config.lead else None
+                })
+        if not items:
+            raise HTMLBlockNotFound(f'{self.__name__}: {config.item.expression}')
+        if not self.fragment_changed(','.join(str(item['id']) for item in items)):
+            return []
+        logger.debug('%s listing: %s', self.__name__, summarize(items))
+        return items
+
+    def parse_next_data(self, content) -> list:
+        config = self.config
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        payload = find_next_data(content)
+        if payload is None:
+            raise ChallengeDetected(f'{self.URL}: нет __NEXT_DATA__')
+
+        span = find_value_span(payload, config.key)
+        fragment = payload[span[0]:span[1]] if span else payload
+        if not self.fragment_changed(fragment):
+            return []
+        if span:
+            key_path_cache.hit()
+            entries = json.loads(fragment)
+        else:
+            entries = key_path_cache.resolve(json.loads(payload), config.key, self.__name__)
+        if not isinstance(entries, list):
+            raise HTMLBlockNotFound(f'{self.__name__}: {config.key}')
+        return [
+            {
+                'id': entry.get(config.id_field),
+                'title': entry.get(config.title_field),
+                'link': urljoin(self.URL, entry.get(config.link_field)),
+                'lead': entry.get(config.lead_field) if config.lead_field else None
+            }
+            for entry in entries
+            if entry.get(config.id_field) and entry.get(config.link_field)
+        ]
+
+    def get_article_text_selenium(self, newslink) -> str:
+        content = self.load(newslink)
+        if not content:
+            return None
+        with stage('text_extraction', self.__name__):
+            return self.extract_article_text(content)
+
+    def extract_article_text(self, content) -> str:
+        paragraphs = [
+            text for text in (
+                (node if isinstance(node, str) else node.text_content()).strip()
+                for node in self.config.article(
+                    html.fromstring(content, parser=self.config.html_parser)
+                )
+            )
+            if text
+        ]
+        text = '\n\n'.join(paragraphs)
+        if len(text) > self.config.max_length:
+            return f'{text[:self.config.max_length]}...\n'
+        return text
+
+    def _driver_pool(self):
+        """
+        Общий пул драйверов (облегчённый при `lean`), если он нужен: для
+        'browser' всегда, для 'tiered' - только когда кто-то уже загрузил
+        Selenium, иначе браузер ещё не нужен.
+        """
+        if self.config.tier == 'http':
+            return None
+        if self.config.tier == 'tiered' and 'bot_app.scraping.driver_pool' not in sys.modules:
+            return None
+        from bot_app.scraping.driver_pool import driver_pool, lean_driver_pool
+        return lean_driver_pool if self.config.lean else driver_pool
+
+    def warm_up(self):
+        pool = self._driver_pool()
+        if pool is not None:
+            pool.open()
+
+    def shutdown(self, force=False):
+        pool = self._driver_pool()
+        if pool is not None:
+            pool.close(force=force)
+
+
+def parser_class(config: SourceConfig) -> type:
+    """Класс парсера для одной записи sources.toml."""
+    return type(
+        f'ConfiguredParser[{config.name}]',
+        (ConfiguredParser,),
+        {'__name__': config.name, 'URL': config.url, 'config': config}
+    )
+
+
+def load_sources(path=SOURCES_PATH) -> dict:
+    """{имя: класс парсера} для всех записей файла, в порядке файла."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'rb') as file:
+        data = tomllib.load(file)
+    classes = {}
+    for entry in data.get('source', []):
+        config = SourceConfig(entry)
+        if config.name in classes:
+            raise ValueError(f'Источник {config.name} описан дважды')
+        classes[config.name] = parser_class(config)
+    return classes
+
+
+_sources = None
+
+
+def sources() -> dict:
+    """Источники из SOURCES_PATH, загружаются при первом обращении."""
+    global _sources
+    if _sources is None:
+        _sources = load_sources()
+    return _sources
+
+
+def enabled_parsers() -> list:
+    """Экземпляры парсеров всех включённых источников."""
+    return [cls() for cls in sources().values() if cls.config.enabled]
+
+
+def __getattr__(name):
+    # 'bot_app.sources:<имя>' в SHARD_PARSERS
+    try:
+        return sources()[name]
+    except KeyError:
+        raise AttributeError(name) from None
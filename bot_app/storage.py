@@ -0,0 +1,201 @@
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from bot_app.consts import (
+    SEEN_BLOOM_CAPACITY,
+    SEEN_CACHE_SIZE,
+    SEEN_COMPACT_PERIOD,
+    SEEN_DB_PATH,
+    SEEN_TTL
+)
+from bot_app.log import logger
+
+
+def connect(path) -> sqlite3.Connection:
+    """Открывает SQLite в режиме WAL для работы из нескольких потоков."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+class BloomFilter:
+    """Фильтр Блума фиксированного размера: отвечает "точно нет" или "возможно"."""
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(
+            self.bits[pos >> 3] & (1 << (pos & 7))
+            for pos in self._positions(key)
+        )
+
+
+class SeenStore:
+    """
+    Хранилище уже опубликованных ID новостей по источникам.
+
+    Все ID лежат в SQLite вместе со временем публикации и удаляются
+    старше `ttl`. Перед базой стоят LRU последних ID и фильтр Блума,
+    поэтому проверка "новость уже была?" почти всегда обходится без диска.
+    """
+
+    def __init__(
+        self,
+        path=SEEN_DB_PATH,
+        ttl=SEEN_TTL,
+        cache_size=SEEN_CACHE_SIZE,
+        capacity=SEEN_BLOOM_CAPACITY,
+        compact_period=SEEN_COMPACT_PERIOD
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.capacity = capacity
+        self.compact_period = compact_period
+        self._conn = None
+        self._recent = OrderedDict()
+        self._last = {}
+        self._bloom = None
+        self._compacted_ts = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(source, news_id) -> str:
+        return f'{source}\x00{news_id}'
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = connect(self.path)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS seen ('
+                'source TEXT NOT NULL, id TEXT NOT NULL, ts REAL NOT NULL, '
+                'PRIMARY KEY (source, id)) WITHOUT ROWID'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS seen_source_ts ON seen (source, ts)'
+            )
+            self._rebuild_bloom()
+            self._compacted_ts = time.monotonic()
+        return self._conn
+
+    def _rebuild_bloom(self):
+        bloom = BloomFilter(self.capacity)
+        for source, news_id in self._conn.execute('SELECT source, id FROM seen'):
+            bloom.add(self._key(source, news_id))
+        self._bloom = bloom
+
+    def _remember(self, key):
+        self._recent[key] = None
+        self._recent.move_to_end(key)
+        if len(self._recent) > self.cache_size:
+            self._recent.popitem(last=False)
+
+    def add(self, source, news_id, ts=None):
+        news_id = str(news_id)
+        ts = time.time() if ts is None else ts
+        key = self._key(source, news_id)
+        with self._lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO seen (source, id, ts) VALUES (?, ?, ?)',
+                (source, news_id, ts)
+            )
+            self._bloom.add(key)
+            self._remember(key)
+            self._last[source] = news_id
+            if time.monotonic() - self._compacted_ts > self.compact_period:
+                self.compact()
+
+    def remember(self, source, news_id):
+        """
+        Отмечает ID увиденным только в памяти: для процессов, где
+        в базу его уже записал другой процесс.
+        """
+        news_id = str(news_id)
+        key = self._key(source, news_id)
+        with self._lock:
+            self.conn
+            self._bloom.add(key)
+            self._remember(key)
+            self._last[source] = news_id
+
+    def contains(self, source, news_id) -> bool:
+        key = self._key(source, str(news_id))
+        with self._lock:
+            conn = self.conn
+            if key in self._recent:
+                self._recent.move_to_end(key)
+                return True
+            if key not in self._bloom:
+                return False
+            found = conn.execute(
+                'SELECT 1 FROM seen WHERE source = ? AND id = ?',
+                (source, str(news_id))
+            ).fetchone() is not None
+            if found:
+                self._remember(key)
+            return found
+
+    def last(self, source) -> str:
+        """Последний опубликованный ID источника или пустая строка."""
+        with self._lock:
+            if source not in self._last:
+                row = self.conn.execute(
+                    'SELECT id FROM seen WHERE source = ? '
+                    'ORDER BY ts DESC LIMIT 1',
+                    (source,)
+                ).fetchone()
+                self._last[source] = row[0] if row else ''
+            return self._last[source]
+
+    def compact(self):
+        """Удаляет ID старше ttl и пересобирает фильтр Блума."""
+        with self._lock:
+            deleted = self.conn.execute(
+                'DELETE FROM seen WHERE ts < ?', (time.time() - self.ttl,)
+            ).rowcount
+            self._rebuild_bloom()
+            self._recent.clear()
+            self._last.clear()
+            self._compacted_ts = time.monotonic()
+        logger.info('Seen store compacted, removed %s ids', deleted)
+
+    def import_legacy_file(self, source, filepath):
+        """Переносит ID из старого однострочного файла news_sources/<source>."""
+        if not os.path.exists(filepath):
+            return
+        with open(filepath, 'r') as file:
+            old_id = file.read().strip()
+        if old_id and not self.last(source):
+            logger.info('Importing last news item ID %s from %s', old_id, filepath)
+            self.add(source, old_id)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+seen_store = SeenStore()
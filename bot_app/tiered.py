@@ -0,0 +1,81 @@
+import threading
+import time
+from urllib.parse import urlparse
+
+from bot_app.consts import TIER_COOLDOWN
+from bot_app.exceptions import ChallengeDetected
+from bot_app.log import logger
+from bot_app.metrics import registry
+
+
+CHALLENGE_STATUS_CODES = (403, 429, 503)
+CHALLENGE_MARKERS = (
+    b'cf-chl', b'challenge-platform', b'Just a moment...',
+    b'Attention Required', b'captcha'
+)
+
+
+def check_response(response):
+    """Бросает ChallengeDetected, если вместо страницы пришла заглушка."""
+    if response.status_code in CHALLENGE_STATUS_CODES:
+        raise ChallengeDetected(f'{response.url}: {response.status_code}')
+    head = response.content[:32 * 1024]
+    if not head.strip():
+        raise ChallengeDetected(f'{response.url}: пустой ответ')
+    for marker in CHALLENGE_MARKERS:
+        if marker in head:
+            raise ChallengeDetected(f'{response.url}: {marker.decode()}')
+
+
+class TieredFetcher:
+    """
+    Сначала пробует дешёвый HTTP, браузер - только если HTTP не справился.
+
+    Если на хосте HTTP вернул заглушку, ошибку или пустой результат,
+    хост на `cooldown` секунд сразу отправляется в браузер.
+    """
+
+    def __init__(self, cooldown=TIER_COOLDOWN):
+        self.cooldown = cooldown
+        self.escalated_until = {}
+        self.counts = {'http': 0, 'browser': 0, 'escalations': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def run(self, url, http, browser):
+        """
+        :param http: Функция загрузки по HTTP; None или исключение - неудача.
+        :param browser: Функция загрузки через браузер.
+        """
+        host = urlparse(url).netloc
+        if time.monotonic() >= self.escalated_until.get(host, 0):
+            try:
+                result = http()
+            except Exception as e:
+                logger.info('HTTP tier failed for %s: %s', url, e)
+                result = None
+            if result is not None:
+                self._count('http')
+                return result
+            logger.info('Escalating %s to browser for %ss', host, self.cooldown)
+            self.escalated_until[host] = time.monotonic() + self.cooldown
+            self._count('escalations')
+
+        self._count('browser')
+        return browser()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return dict(self.counts)
+
+
+tiered_fetcher = TieredFetcher()
+registry.callback(
+    'tier_requests_total',
+    'Загрузки по уровням: HTTP, браузер и переходы на браузер',
+    lambda: [({'tier': tier}, count) for tier, count in tiered_fetcher.stats().items()],
+    type='counter'
+)
@@ -1,4 +1,7 @@
 import re
+from datetime import datetime, timezone
+
+from bot_app.metrics import registry
 
 
 def escape_markdown(text):
@@ -7,41 +10,133 @@ def escape_markdown(text):
     return re.sub(f'({escape_chars})', r'\\1', text)
 
 
-def find_key(data, key):
-    """Для поиска данных по ключу во вложенных словарях."""
+def parse_timestamp(value):
+    """
+    Время публикации из данных источника в секундах эпохи: число
+    (секунды или миллисекунды) или строка ISO 8601, время без пояса
+    считается UTC. Для всего остального - None.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        try:
+            value = float(value)
+        except ValueError:
+            try:
+                parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+            except ValueError:
+                return None
+            if parsed.tzinfo is None:
+                parsed = parsed.replace(tzinfo=timezone.utc)
+            return parsed.timestamp()
+    if not isinstance(value, (int, float)) or value != value or value <= 0:
+        return None
+    # миллисекунды: секунды эпохи станут 12-значными только через тысячи лет
+    return value / 1000 if value > 1e11 else float(value)
+
+
+def _children(data):
     if isinstance(data, dict):
-        if key in data:
-            return data[key]
-        for value in data.values():
-            result = find_key(value, key)
-            if result is not None:
-                return result
-    elif isinstance(data, list):
-        for item in data:
-            result = find_key(item, key)
-            if result is not None:
-                return result
-    return None
+        return data.items()
+    if isinstance(data, list):
+        return enumerate(data)
+    return ()
 
 
 def find_key_path(data, key, path=None):
     """Возвращает путь из ключей до нужного ключа во вложенных словарях."""
+    # обход в глубину без рекурсии и копирования путей: для каждого узла
+    # храним только индекс родителя, путь собираем один раз в конце
+    nodes = [(None, None)]
+    stack = [(data, 0)]
+    while stack:
+        node, index = stack.pop()
+        if isinstance(node, dict) and key in node:
+            result = [key]
+            while index:
+                parent, k = nodes[index]
+                result.append(k)
+                index = parent
+            return list(path or []) + result[::-1]
+        children = []
+        for k, value in _children(node):
+            if isinstance(value, (dict, list)):
+                nodes.append((index, k))
+                children.append((value, len(nodes) - 1))
+        stack.extend(reversed(children))
+    return None
+
+
+def find_key(data, key):
+    """Для поиска данных по ключу во вложенных словарях."""
+    path = find_key_path(data, key)
     if path is None:
-        path = []
+        return None
+    return get_by_path(data, path)
 
-    if isinstance(data, dict):
-        if key in data:
-            return path + [key]
-        for k, value in data.items():
-            result = find_key_path(value, key, path + [k])
-            if result is not None:
-                return result
-    elif isinstance(data, list):
-        for index, item in enumerate(data):
-            result = find_key_path(item, key, path + [index])
-            if result is not None:
-                return result
-    return None
+
+def get_by_path(data, path):
+    """Значение по пути из ключей или KeyError/IndexError/TypeError."""
+    for k in path:
+        data = data[k]
+    return data
+
+
+class KeyPathCache:
+    """
+    Запоминает найденные пути до ключей по источникам.
+
+    Сначала пробуется сохранённый путь (O(глубины)), и только при промахе
+    выполняется полный поиск find_key_path. Счётчики hits/misses показывают,
+    как часто меняется разметка источника.
+    """
+
+    def __init__(self):
+        self.paths = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, data, key, source=''):
+        path = self.paths.get((source, key))
+        if path is not None:
+            try:
+                value = get_by_path(data, path)
+            except (KeyError, IndexError, TypeError):
+                value = None
+            if isinstance(value, dict) and key in value:
+                self.hits += 1
+                return value[key]
+
+        self.misses += 1
+        path = find_key_path(data, key)
+        if path is None:
+            self.paths.pop((source, key), None)
+            return None
+        self.paths[(source, key)] = path[:-1]
+        return get_by_path(data, path)
+
+    def hit(self):
+        """
+        Ключ найден без обхода дерева, например прямо в байтах страницы:
+        считаем это попаданием, чтобы счётчики отражали разметку источника.
+        """
+        self.hits += 1
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+key_path_cache = KeyPathCache()
+registry.callback(
+    'key_path_cache_requests_total',
+    'Обращения к кешу путей ключей в JSON',
+    lambda: [
+        ({'result': 'hit'}, key_path_cache.hits),
+        ({'result': 'miss'}, key_path_cache.misses)
+    ],
+    type='counter'
+)
 
 # пример
 # with open('cache', 'r', encoding='utf-8') as file:
@@ -1,33 +1,63 @@
 import time
+import multiprocessing
 import signal
 import sys
 
-from bot_app.bot import bot
+from bot_app.bot import create_app
+from bot_app.exceptions import ConfigError
 from bot_app.log import logger
+from bot_app.consts import PROFILE_SIGNAL_CYCLES
+from bot_app.metrics import start_server
+from bot_app.profiling import profiler
 
 
 ENV_PATH = '.env'
 is_running = False
+app = None
 
 
 def signal_handler(sig, frame):
     logger.info("Received interrupt signal, stopping polling...")
+    if app is not None:
+        app.stop()
+        app.bot.stop_polling()
     sys.exit(0)
 
 
+def profile_signal_handler(sig, frame):
+    profiler.arm(PROFILE_SIGNAL_CYCLES)
+
+
 def main():
+    global app
+    try:
+        app = create_app()
+    except ConfigError as e:
+        logger.error("%s", e)
+        sys.exit(1)
+    # новости из outbox уходят сразу, парсинг по-прежнему по /start
+    app.start()
+    try:
+        start_server()
+    except OSError as e:
+        logger.warning("Metrics server is not started: %s", e)
     logger.info("Starting polling...")
-    bot.infinity_polling()
+    app.bot.infinity_polling()
 
 
 if __name__ == '__main__':
+    # в собранном PyInstaller exe процессы-воркеры запускают этот же файл
+    multiprocessing.freeze_support()
     # Set up the signal handler for pressing Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
+    # kill -USR1 <pid> - профилировать несколько следующих циклов
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, profile_signal_handler)
 
     try:
         main()
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         sys.exit(1)
     finally:
         logger.info("Shutting down...")
@@ -0,0 +1,163 @@
+"""
+Офлайн-бенчмарк экстракторов на страницах из test_utilities/fixtures.
+
+По умолчанию берутся сохранённые живые страницы из fixtures/recorded/
+(record_page.py), а синтетические из fixtures/synthetic/ - только для
+кейсов, у которых записанной страницы нет; такие строки помечены.
+
+Замеряет время, пропускную способность и пиковую память, дописывает
+результат в bench_results.jsonl вместе с текущим коммитом и сравнивает
+с предыдущим запуском:
+
+    python test_utilities/bench.py [-n 50] [--filter listing] [--corpus all]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(ROOT, 'test_utilities', 'fixtures')
+CORPORA = ('recorded', 'synthetic')
+RESULTS_PATH = os.path.join(ROOT, 'test_utilities', 'bench_results.jsonl')
+
+sys.path.insert(0, ROOT)
+# парсеры пишут parser.log и news_sources/ в текущий каталог
+os.chdir(tempfile.mkdtemp(prefix='bench_'))
+
+from bot_app.next_data import extract_news_store  # noqa: E402
+from bot_app.parsers import InvestingParser, extract_html_text  # noqa: E402
+from bot_app.scraping.parsers import extract_article_text  # noqa: E402
+from bot_app.utils import KeyPathCache, find_key  # noqa: E402
+
+
+def fixtures(prefix, corpus='recorded') -> dict:
+    """
+    {'корпус/файл': страница} для кейса. С corpus='recorded' синтетика
+    берётся, только если записанных страниц для кейса нет.
+    """
+    result = {}
+    for name in (CORPORA if corpus == 'all' else (corpus,)):
+        pattern = os.path.join(FIXTURES_DIR, name, f'{prefix}*.html')
+        for path in sorted(glob.glob(pattern)):
+            with open(path, 'rb') as file:
+                result[f'{name}/{os.path.basename(path)}'] = file.read()
+    if not result and corpus == 'recorded':
+        return fixtures(prefix, 'synthetic')
+    return result
+
+
+def investing_listing_case(raw):
+    parser = InvestingParser()
+
+    def run():
+        # иначе повторный разбор отсечётся по хешу списка
+        parser.fragment_hash = None
+        return parser.parse_listing(raw)
+    return run
+
+
+def find_key_case(raw):
+    news_store = extract_news_store(raw)
+    state = {'newsStore': news_store, 'quotesStore': {'quotes': list(range(1000))}}
+    return lambda: find_key(state, '_mostPopularNewsList')
+
+
+def key_path_cache_case(raw):
+    cache = KeyPathCache()
+    state = {'newsStore': extract_news_store(raw)}
+    return lambda: cache.resolve(state, '_mostPopularNewsList', 'bench')
+
+
+CASES = [
+    ('investing_listing', 'listing_investing', investing_listing_case),
+    ('article_text', 'article_investing', lambda raw: lambda: extract_article_text(raw)),
+    ('html_text_xpath', 'article_investing', lambda raw: lambda: extract_html_text(raw)),
+    ('find_key', 'listing_investing', find_key_case),
+    ('key_path_cache', 'listing_investing', key_path_cache_case),
+]
+
+
+def measure(func, iterations) -> dict:
+    func()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return {
+        'mean_ms': elapsed / iterations * 1000,
+        'ops_per_sec': iterations / elapsed,
+        'peak_kb': peak / 1024,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ''
+
+
+def previous_results() -> dict:
+    if not os.path.exists(RESULTS_PATH):
+        return {}
+    with open(RESULTS_PATH, 'r', encoding='utf-8') as file:
+        lines = file.read().splitlines()
+    return json.loads(lines[-1])['results'] if lines else {}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('-n', '--iterations', type=int, default=50)
+    arg_parser.add_argument('--filter', default='')
+    arg_parser.add_argument('--no-save', action='store_true')
+    arg_parser.add_argument('--corpus', choices=CORPORA + ('all',), default='recorded')
+    args = arg_parser.parse_args()
+
+    previous = previous_results()
+    results = {}
+    for name, prefix, case in CASES:
+        for fixture, raw in fixtures(prefix, args.corpus).items():
+            key = f'{name}[{fixture}]'
+            if args.filter not in key:
+                continue
+            result = measure(case(raw), args.iterations)
+            results[key] = result
+
+            line = (
+                f'{key:<55} {result["mean_ms"]:9.3f} ms '
+                f'{result["ops_per_sec"]:10.1f} op/s {result["peak_kb"]:9.1f} KB'
+            )
+            if key in previous:
+                change = result['mean_ms'] / previous[key]['mean_ms'] - 1
+                line += f'  {change:+.1%}'
+            print(line)
+
+    if any(key.split('[', 1)[1].startswith('synthetic/') for key in results):
+        print('synthetic/ - сгенерированные страницы: на живых время может отличаться')
+
+    if not args.no_save:
+        with open(RESULTS_PATH, 'a', encoding='utf-8') as file:
+            file.write(json.dumps({
+                'commit': git_commit(),
+                'ts': int(time.time()),
+                'iterations': args.iterations,
+                'results': results,
+            }) + '\n')
+
+
+if __name__ == '__main__':
+    main()
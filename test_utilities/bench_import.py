@@ -0,0 +1,97 @@
+"""
+Время холодного импорта точек входа: каждый модуль импортируется
+в отдельном процессе с `python -X importtime`, поэтому кэш модулей
+не влияет на результат. Печатает общее время и самые тяжёлые модули:
+
+    python test_utilities/bench_import.py
+    python test_utilities/bench_import.py bot_app.bot --top 15 --max-ms 250
+
+С --max-ms завершается с кодом 1, если какой-то модуль импортируется
+дольше, чтобы тяжёлые зависимости не возвращались в импорт незаметно.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTRY_POINTS = [
+    'bot_app.bot',
+    'bot_app.parsers',
+    'bot_app.sources',
+    'bot_app.sharding',
+    'bot_app.scraping.parsers',
+    'main',
+]
+# модули, которых не должно быть после импорта точек входа
+HEAVY = ('selenium', 'selenium_stealth', 'webdriver_manager', 'bs4', 'httpx')
+
+LINE = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+
+
+def import_times(module, repeat=3) -> tuple:
+    """
+    Лучшее из `repeat` время импорта `module`, мс, и список
+    (модуль, собственное мс, с вложенными мс) из этого запуска.
+    """
+    best = None
+    # parser.log и прочие файлы пишутся во временный каталог
+    cwd = tempfile.mkdtemp(prefix='import_')
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+            cwd=cwd, env=env, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f'{module}: {result.stderr.strip().splitlines()[-1]}')
+        modules = []
+        total = 0
+        for line in result.stderr.splitlines():
+            match = LINE.match(line)
+            if not match:
+                continue
+            own, cumulative, indent, name = match.groups()
+            modules.append((name, int(own) / 1000, int(cumulative) / 1000))
+            if name == module:
+                total = int(cumulative) / 1000
+        if best is None or total < best[0]:
+            best = (total, modules)
+    return best
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    arg_parser.add_argument('--top', type=int, default=8, help='сколько тяжёлых модулей показать')
+    arg_parser.add_argument('--max-ms', type=float, default=None, help='бюджет на модуль, мс')
+    args = arg_parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        total, modules = import_times(module, args.repeat)
+        loaded = {name.split('.')[0] for name, _, _ in modules}
+        heavy = sorted(loaded.intersection(HEAVY))
+        print(f'{module}: {total:.1f} ms' + (f' (загружены: {", ".join(heavy)})' if heavy else ''))
+        # пакеты верхнего уровня по времени с вложенными модулями
+        packages = {}
+        for name, _, cumulative in modules:
+            # site грузится при старте интерпретатора, а не импортом модуля
+            if '.' not in name and name not in (module, 'site'):
+                packages[name] = packages.get(name, 0) + cumulative
+        for name, cumulative in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'    {cumulative:8.1f} ms  {name}')
+        if args.max_ms is not None and total > args.max_ms:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f'Дольше {args.max_ms} ms: {", ".join(over_budget)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
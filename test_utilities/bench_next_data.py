@@ -0,0 +1,73 @@
+"""
+Микробенчмарк извлечения newsStore со страницы investing.com:
+BeautifulSoup по всей странице против bot_app.next_data.
+
+По умолчанию берётся сохранённая страница fixtures/recorded/listing_investing.html
+(test_utilities/record_page.py), а если её нет - синтетическая из
+fixtures/synthetic/: она меньше живой, и ускорение на ней показательно
+только для сравнения коммитов между собой. Другую страницу можно указать:
+
+    python test_utilities/bench_next_data.py path/to/page.html
+"""
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from bot_app.next_data import extract_news_store  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def bs4_news_store(raw: bytes) -> dict:
+    soup = BeautifulSoup(raw.decode('utf-8'), 'html.parser')
+    script_tag = soup.find('script', id='__NEXT_DATA__')
+    json_data = json.loads(script_tag.string)
+    return json_data['props']['pageProps']['state']['newsStore']
+
+
+def measure(func, raw, repeat):
+    tracemalloc.start()
+    func(raw)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func(raw)
+    elapsed = (time.perf_counter() - start) / repeat
+    return elapsed, peak
+
+
+def main():
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+    else:
+        path = os.path.join(FIXTURES_DIR, 'recorded', 'listing_investing.html')
+        if not os.path.exists(path):
+            path = os.path.join(FIXTURES_DIR, 'synthetic', 'listing_investing.html')
+            print('Записанной страницы нет, замер на синтетической (record_page.py)')
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with open(path, 'rb') as file:
+        raw = file.read()
+
+    assert bs4_news_store(raw) == extract_news_store(raw), 'результаты различаются'
+
+    print(f'{path}: {len(raw) / 1024 / 1024:.2f} MB, {repeat} повторов')
+    results = {}
+    for name, func in (('bs4', bs4_news_store), ('next_data', extract_news_store)):
+        elapsed, peak = measure(func, raw, repeat)
+        results[name] = (elapsed, peak)
+        print(f'{name:>10}: {elapsed * 1000:8.2f} ms, peak {peak / 1024 / 1024:7.2f} MB')
+
+    (bs4_time, bs4_peak), (fast_time, fast_peak) = results['bs4'], results['next_data']
+    print(f'ускорение x{bs4_time / fast_time:.1f}, память x{bs4_peak / max(fast_peak, 1):.1f}')
+
+
+if __name__ == '__main__':
+    main()
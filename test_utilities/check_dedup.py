@@ -0,0 +1,175 @@
+"""
+Проверка поиска дублей между источниками на реальных парах заголовков:
+пересказы одной новости должны совпадать, разные новости по одному
+шаблону - нет. Печатает расстояние по каждой паре:
+
+    python test_utilities/check_dedup.py
+
+Завершается с кодом 1, если хоть одна пара решена неверно.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot_app.dedup import NearDuplicateIndex, NewsSignature  # noqa: E402
+
+# (заголовок, лид) с двух источников об одном и том же
+DUPLICATES = [
+    (
+        ('ЦБ повысил ключевую ставку до 21%',
+         'Банк России на заседании в пятницу повысил ключевую ставку на 200 базисных '
+         'пунктов, до 21% годовых. Регулятор сослался на ускорение инфляции.'),
+        ('Банк России поднял ключевую ставку до 21% годовых',
+         'Совет директоров Банка России повысил ключевую ставку на 200 б.п., до 21% '
+         'годовых, говорится в сообщении регулятора. Решение объясняется ускорением инфляции.'),
+    ),
+    (
+        ('Нефть Brent подорожала до $80 за баррель',
+         'Стоимость фьючерсов на нефть марки Brent поднялась выше $80 за баррель впервые '
+         'с апреля на фоне сокращения запасов в США.'),
+        ('Brent превысила $80 за баррель впервые с апреля',
+         'Цена нефти Brent поднялась выше $80 за баррель впервые с апреля. Рынок '
+         'поддержали данные о сокращении запасов нефти в США.'),
+    ),
+    (
+        ('Минфин увеличил объем продаж валюты до 5 млрд рублей в день',
+         'Министерство финансов с 7 августа будет направлять на продажу валюты и золота '
+         '5 млрд рублей в день в рамках бюджетного правила.'),
+        ('Минфин будет продавать валюту на 5 млрд рублей в день',
+         'С 7 августа Минфин увеличит ежедневные продажи валюты и золота по бюджетному '
+         'правилу до 5 млрд рублей.'),
+    ),
+    (
+        ('Сбербанк увеличил чистую прибыль по МСФО на 10%',
+         'Чистая прибыль Сбербанка по МСФО за девять месяцев выросла на 10%, до 1,2 трлн '
+         'рублей, сообщил банк.'),
+        ('Чистая прибыль Сбербанка по МСФО выросла на 10%',
+         'Сбербанк за девять месяцев заработал 1,2 трлн рублей чистой прибыли по МСФО, '
+         'что на 10% больше, чем годом ранее.'),
+    ),
+    (
+        ('ЦБ повысил ключевую ставку до 21%', None),
+        ('ЦБ повысил ключевую ставку до 21 %.', None),
+    ),
+]
+
+# разные новости, похожие словами
+DIFFERENT = [
+    (
+        ('ЦБ повысил ключевую ставку до 21%',
+         'Банк России на заседании в пятницу повысил ключевую ставку на 200 базисных '
+         'пунктов, до 21% годовых. Регулятор сослался на ускорение инфляции.'),
+        ('ЦБ сохранил ключевую ставку на уровне 21%',
+         'Банк России на заседании в пятницу оставил ключевую ставку без изменений, '
+         'на уровне 21% годовых. Регулятор отметил замедление инфляции.'),
+    ),
+    (
+        ('ЦБ повысил ключевую ставку до 21%', None),
+        ('ЦБ сохранил ключевую ставку на уровне 21%', None),
+    ),
+    (
+        ('Акции Apple выросли на 5% после отчета',
+         'Бумаги Apple подорожали на 5% на премаркете после публикации квартального '
+         'отчета: выручка компании превысила ожидания аналитиков.'),
+        ('Акции Tesla выросли на 5% после отчета',
+         'Бумаги Tesla подорожали на 5% на премаркете после публикации квартального '
+         'отчета: поставки электромобилей превысили ожидания аналитиков.'),
+    ),
+    (
+        ('Акции Apple выросли на 5%', None),
+        ('Акции Tesla выросли на 5%', None),
+    ),
+    (
+        ('Нефть Brent подорожала до $80 за баррель',
+         'Стоимость фьючерсов на нефть марки Brent поднялась выше $80 за баррель впервые '
+         'с апреля на фоне сокращения запасов в США.'),
+        ('Нефть Brent подешевела до $75 за баррель',
+         'Стоимость фьючерсов на нефть марки Brent опустилась ниже $75 за баррель на фоне '
+         'роста запасов в США.'),
+    ),
+    (
+        ('Курс доллара превысил 100 рублей',
+         'Официальный курс доллара, установленный ЦБ на завтра, превысил 100 рублей '
+         'впервые с октября.'),
+        ('Курс евро превысил 110 рублей',
+         'Официальный курс евро, установленный ЦБ на завтра, превысил 110 рублей '
+         'впервые с октября.'),
+    ),
+    (
+        ('Сбербанк увеличил чистую прибыль по МСФО на 10%',
+         'Чистая прибыль Сбербанка по МСФО за девять месяцев выросла на 10%, до 1,2 трлн '
+         'рублей, сообщил банк.'),
+        ('ВТБ увеличил чистую прибыль по МСФО на 10%',
+         'Чистая прибыль ВТБ по МСФО за девять месяцев выросла на 10%, до 400 млрд '
+         'рублей, сообщил банк.'),
+    ),
+    (
+        ('ФРС снизила ставку на 0,5 п.п.',
+         'Федеральная резервная система США снизила базовую процентную ставку на 50 '
+         'базисных пунктов, до диапазона 4,75-5%, впервые с 2020 года.'),
+        ('ЕЦБ снизил ставку на 0,25 п.п.',
+         'Европейский центральный банк снизил депозитную ставку на 25 базисных пунктов, '
+         'до 3,5%, второй раз с начала года.'),
+    ),
+]
+
+
+def is_duplicate(first, second, source='first') -> bool:
+    """Отправляет первую новость и проверяет вторую с источника `second`."""
+    index = NearDuplicateIndex()
+    index.register((source, '1'), *first)
+    return index.check(('second', '2'), *second) is not None
+
+
+def check_pairs() -> list:
+    errors = []
+    for expected, pairs in ((True, DUPLICATES), (False, DIFFERENT)):
+        for first, second in pairs:
+            distance = (
+                NewsSignature('first', *first).value ^ NewsSignature('second', *second).value
+            ).bit_count()
+            found = is_duplicate(first, second)
+            print(f'{"ok  " if found == expected else "FAIL"} {distance:2} бит  '
+                  f'{first[0]!r} / {second[0]!r}{"" if first[1] else " (без лида)"}')
+            if found != expected:
+                errors.append(f'{first[0]!r} / {second[0]!r}: ожидалось {expected}')
+    return errors
+
+
+def check_index() -> list:
+    errors = []
+    first, second = DUPLICATES[0]
+    # новости одного источника - разные, даже если похожи
+    if is_duplicate(first, second, source='second'):
+        errors.append('совпали новости одного источника')
+
+    index = NearDuplicateIndex()
+    if index.check(('first', '1'), *first) is not None:
+        errors.append('первая копия не прошла проверку')
+    # первая ещё отправляется: копию откладываем, а не отбрасываем
+    if index.check(('second', '2'), *second) != (('first', '1'), False):
+        errors.append('копия не отложена, пока первая отправляется')
+    # отправка не удалась: копия уходит вместо неё
+    index.release(('first', '1'))
+    if index.check(('second', '2'), *second) is not None:
+        errors.append('копия не прошла после неудачной отправки первой')
+    index.register(('second', '2'), *second)
+    if index.check(('first', '1'), *first) != (('second', '2'), True):
+        errors.append('после доставки копия не считается дублем')
+    index.release(('second', '2'))
+    if len(index) != 1:
+        errors.append('release убрал отправленную новость')
+    return errors
+
+
+def main():
+    errors = check_pairs() + check_index()
+    for error in errors:
+        print(f'Ошибка: {error}')
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Сквозной бенчмарк конвейера без интернета: NewsParser опрашивает
+локальный NewsSite, сообщения уходят в FakeBotAPI. Считает задержку
+от публикации новости до приёма сообщения (p50/p95/p99) и пропускную
+способность:
+
+    python test_utilities/e2e_bench.py --duration 60 --rate 30 --rate-limit 0.05
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'test_utilities'))
+# парсеры пишут parser.log и news_sources/ в текущий каталог
+os.chdir(tempfile.mkdtemp(prefix='e2e_'))
+os.environ.setdefault('TOKEN', '1:standin')
+os.environ.setdefault('CHANNEL_ID', '@standin')
+
+from standin import FakeBotAPI, NewsSite  # noqa: E402
+
+import telebot  # noqa: E402
+from telebot import apihelper  # noqa: E402
+
+from bot_app.bot import NewsParser  # noqa: E402
+from bot_app.dispatcher import OutboundDispatcher  # noqa: E402
+from bot_app.metrics import summary  # noqa: E402
+from bot_app.polling import AdaptiveInterval  # noqa: E402
+from bot_app.scraping.parsers import InvestingParserSelenium  # noqa: E402
+
+
+ARTICLE_ID = re.compile(r'article-(\d+)')
+
+
+def percentile(values, q) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def latencies(site: NewsSite, api: FakeBotAPI, since) -> list:
+    result = []
+    for received_ts, _, text in api.messages:
+        match = ARTICLE_ID.search(text)
+        published_ts = site.published.get(match.group(1)) if match else None
+        # новости, опубликованные до старта, в задержку не входят
+        if published_ts is not None and published_ts >= since:
+            result.append(received_ts - published_ts)
+    return result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--duration', type=float, default=60)
+    arg_parser.add_argument('--rate', type=float, default=30, help='новостей в минуту')
+    arg_parser.add_argument('--min-period', type=float, default=1)
+    arg_parser.add_argument('--max-period', type=float, default=10)
+    arg_parser.add_argument('--latency', type=float, default=0, help='задержка Bot API, с')
+    arg_parser.add_argument('--rate-limit', type=float, default=0, help='доля ответов 429')
+    arg_parser.add_argument('--chat-rate', type=float, default=None, help='сообщений в секунду')
+    args = arg_parser.parse_args()
+
+    api = FakeBotAPI(latency=args.latency, rate_limit_ratio=args.rate_limit).start()
+    site = NewsSite(rate=args.rate).start()
+    apihelper.API_URL = api.api_url
+
+    parser = InvestingParserSelenium(tiered=True)
+    parser.URL = site.url + '/news/most-popular-news'
+    parser.interval = AdaptiveInterval(
+        min_period=args.min_period, max_period=args.max_period
+    )
+    bot = telebot.TeleBot(os.environ['TOKEN'])
+    dispatcher_kwargs = {}
+    if args.chat_rate:
+        dispatcher_kwargs = {'chat_rate': args.chat_rate, 'chat_burst': args.chat_rate}
+    news_parser = NewsParser(
+        [parser],
+        OutboundDispatcher(bot.send_message, **dispatcher_kwargs),
+        os.environ['CHANNEL_ID']
+    )
+
+    started = time.time()
+    news_parser.start_thread(0)
+    try:
+        time.sleep(args.duration)
+    finally:
+        news_parser.stop_thread(timeout=10)
+        site.stop()
+        api.stop()
+
+    elapsed = time.time() - started
+    published = sum(1 for ts in site.published.values() if ts >= started)
+    values = latencies(site, api, started)
+    print(f'published:     {published}')
+    print(f'posted:        {len(values)}')
+    print(f'throughput:    {len(values) / elapsed * 60:.1f} items/min')
+    print(f'rate limited:  {api.rate_limited}')
+    for q in (50, 95, 99):
+        print(f'p{q} latency:   {percentile(values, q):.2f} s')
+    print()
+    print(summary())
+
+
+if __name__ == '__main__':
+    main()
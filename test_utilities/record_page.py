@@ -0,0 +1,79 @@
+"""
+Сохраняет живую страницу в test_utilities/fixtures/recorded/ для
+офлайн-бенчмарков. Запрос уходит без cookies, а из ответа вычищаются
+значения, похожие на токены и идентификаторы сессии:
+
+    python test_utilities/record_page.py https://ru.investing.com/news/most-popular-news listing_investing
+    python test_utilities/record_page.py <url статьи> article_investing
+
+Имя файла задаёт, какие кейсы bench.py его подхватят: listing_investing*,
+article_investing*, listing_rbc*. Страницу из браузера (Ctrl+S, "только
+HTML") можно вычистить так же: --file путь/к/странице.html.
+"""
+import argparse
+import os
+import re
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RECORDED_DIR = os.path.join(ROOT, 'test_utilities', 'fixtures', 'recorded')
+
+sys.path.insert(0, ROOT)
+
+from bot_app.consts import BROWSER_HEADERS  # noqa: E402
+
+SCRUBBED = 'scrubbed'
+# ключи JSON и имена cookies, значения которых не должны попасть в git
+SECRET_NAME = rb'[\w.-]*(?:token|csrf|xsrf|session|sessid|udid|clearance|__cf_bm)[\w.-]*'
+SECRET_PATTERNS = [
+    # "csrfToken": "...", "udid":"..."
+    re.compile(rb'("' + SECRET_NAME + rb'"\s*:\s*")(?:[^"\\]|\\.)*(")', re.I),
+    # <meta name="csrf-token" content="...">
+    re.compile(rb'(<meta[^>]+name="' + SECRET_NAME + rb'"[^>]+content=")[^"]*(")', re.I),
+    # name=value в document.cookie и ссылках
+    re.compile(rb'(\b' + SECRET_NAME + rb'=)[^;&"\'\s]+()', re.I),
+]
+
+
+def scrub(raw: bytes) -> tuple:
+    """Страница без секретов и число заменённых значений."""
+    total = 0
+    for pattern in SECRET_PATTERNS:
+        raw, count = pattern.subn(rb'\1' + SCRUBBED.encode() + rb'\2', raw)
+        total += count
+    return raw, total
+
+
+def fetch(url) -> bytes:
+    import httpx
+
+    response = httpx.get(url, headers=BROWSER_HEADERS, follow_redirects=True, timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('url', nargs='?')
+    arg_parser.add_argument('name', help='имя файла без .html, например listing_investing')
+    arg_parser.add_argument('--file', help='вычистить сохранённую страницу вместо загрузки')
+    args = arg_parser.parse_args()
+    if not args.url and not args.file:
+        arg_parser.error('нужен url или --file')
+
+    if args.file:
+        with open(args.file, 'rb') as file:
+            raw = file.read()
+    else:
+        raw = fetch(args.url)
+    raw, scrubbed = scrub(raw)
+
+    os.makedirs(RECORDED_DIR, exist_ok=True)
+    path = os.path.join(RECORDED_DIR, f'{args.name}.html')
+    with open(path, 'wb') as file:
+        file.write(raw)
+    print(f'{path}: {len(raw) // 1024} KB, вычищено значений: {scrubbed}')
+
+
+if __name__ == '__main__':
+    main()
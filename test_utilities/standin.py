@@ -0,0 +1,248 @@
+"""
+Локальные заглушки для сквозных тестов без интернета.
+
+NewsSite - сайт в формате investing.com/РБК, публикующий новости
+с заданной частотой. FakeBotAPI - Bot API Telegram, который записывает
+сообщения и умеет отвечать 429 и с задержкой.
+
+    python test_utilities/standin.py --rate 6
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic import (  # noqa: E402
+    investing_article_page,
+    investing_listing_page,
+    iso_time,
+    rbc_listing_page,
+    sentence
+)
+
+
+LISTING_SIZE = 30
+
+
+class _Server:
+    def __init__(self, handler, host='127.0.0.1', port=0):
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.owner = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_body(self, status, body: bytes, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _NewsSiteHandler(_Handler):
+    def do_GET(self):
+        site: NewsSite = self.server.owner
+        path = urlsplit(self.path).path.rstrip('/')
+        article = re.search(r'article-(\d+)$', path)
+        if path.endswith('most-popular-news') or path.endswith('crypto'):
+            body, etag = site.listing(rbc=path.endswith('crypto'))
+            if self.headers.get('If-None-Match') == etag:
+                self.send_body(304, b'', 'text/html', {'ETag': etag})
+                return
+            self.send_body(200, body, 'text/html; charset=utf-8', {'ETag': etag})
+        elif article:
+            self.send_body(
+                200,
+                investing_article_page(int(article.group(1))).encode(),
+                'text/html; charset=utf-8'
+            )
+        else:
+            self.send_body(404, b'not found', 'text/plain')
+
+
+class NewsSite(_Server):
+    """
+    Сайт новостей, публикующий `rate` новостей в минуту
+    (пуассоновский поток) и запоминающий время публикации каждой.
+    """
+
+    def __init__(self, rate=6.0, initial=LISTING_SIZE, seed=0, **kwargs):
+        super().__init__(_NewsSiteHandler, **kwargs)
+        self.rate = rate
+        self.rnd = random.Random(seed)
+        self.items = []
+        self.published = {}
+        self._next_id = 2700000
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        for _ in range(initial):
+            self.publish()
+
+    def publish(self) -> dict:
+        with self._lock:
+            self._next_id += 1
+            item = {
+                'article_ID': self._next_id,
+                'title': sentence(self.rnd, 8),
+                'href': f'/news/world-news/article-{self._next_id}',
+                'date': iso_time(time.time()),
+            }
+            self.items.insert(0, item)
+            del self.items[LISTING_SIZE:]
+            self.published[str(self._next_id)] = time.time()
+            return item
+
+    def listing(self, rbc=False):
+        with self._lock:
+            items = list(self.items)
+        body = (rbc_listing_page(items) if rbc else investing_listing_page(items)).encode()
+        return body, '"{}"'.format(hashlib.md5(body).hexdigest())
+
+    def _publisher(self):
+        while self.rate > 0 and not self._stop.wait(self.rnd.expovariate(self.rate / 60)):
+            self.publish()
+
+    def start(self):
+        super().start()
+        threading.Thread(target=self._publisher, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        super().stop()
+
+
+class _BotAPIHandler(_Handler):
+    def _params(self) -> dict:
+        params = dict(parse_qsl(urlsplit(self.path).query))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            body = self.rfile.read(length).decode('utf-8')
+            if self.headers.get('Content-Type', '').startswith('application/json'):
+                params.update(json.loads(body))
+            else:
+                params.update(parse_qsl(body))
+        return params
+
+    def _reply(self, status, payload):
+        self.send_body(status, json.dumps(payload).encode(), 'application/json')
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        api: FakeBotAPI = self.server.owner
+        method = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        params = self._params()
+        if api.latency:
+            time.sleep(api.latency)
+
+        if method == 'getMe':
+            self._reply(200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'fake', 'username': 'fake_bot'
+            }})
+        elif method == 'sendMessage':
+            if api.rnd.random() < api.rate_limit_ratio:
+                api.rate_limited += 1
+                self._reply(429, {
+                    'ok': False, 'error_code': 429,
+                    'description': 'Too Many Requests: retry after {}'.format(api.retry_after),
+                    'parameters': {'retry_after': api.retry_after},
+                })
+                return
+            message = api.record(params)
+            self._reply(200, {'ok': True, 'result': message})
+        else:
+            self._reply(200, {'ok': True, 'result': True})
+
+
+class FakeBotAPI(_Server):
+    """
+    Bot API Telegram: записывает отправленные сообщения со временем приёма.
+    Долю ответов `rate_limit_ratio` возвращает как 429 с `retry_after`.
+    """
+
+    def __init__(self, latency=0.0, rate_limit_ratio=0.0, retry_after=1, seed=0, **kwargs):
+        super().__init__(_BotAPIHandler, **kwargs)
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.rnd = random.Random(seed)
+        self.messages = []
+        self.rate_limited = 0
+        self._lock = threading.Lock()
+
+    @property
+    def api_url(self) -> str:
+        """Шаблон для telebot.apihelper.API_URL."""
+        return self.url + '/bot{0}/{1}'
+
+    def record(self, params) -> dict:
+        with self._lock:
+            message = {
+                'message_id': len(self.messages) + 1,
+                'date': iso_time(time.time()),
+                'chat': {'id': params.get('chat_id'), 'type': 'channel'},
+                'text': params.get('text', ''),
+            }
+            self.messages.append((time.time(), params.get('chat_id'), params.get('text', '')))
+            return message
+
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--rate', type=float, default=6, help='новостей в минуту')
+    arg_parser.add_argument('--site-port', type=int, default=8080)
+    arg_parser.add_argument('--api-port', type=int, default=8081)
+    arg_parser.add_argument('--latency', type=float, default=0)
+    arg_parser.add_argument('--rate-limit', type=float, default=0)
+    args = arg_parser.parse_args()
+
+    site = NewsSite(rate=args.rate, port=args.site_port).start()
+    api = FakeBotAPI(
+        latency=args.latency, rate_limit_ratio=args.rate_limit, port=args.api_port
+    ).start()
+    print(f'news site: {site.url}/news/most-popular-news')
+    print(f'bot api:   {api.api_url}')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        site.stop()
+        api.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Синтетические страницы в формате investing.com и РБК для офлайн-тестов.
+Разметка и поля списка повторяют известное о живых страницах, но
+придуманы; замеры на реальных страницах - в fixtures/recorded/
+(см. record_page.py).
+
+Запуск без аргументов пересобирает fixtures/synthetic/:
+
+    python test_utilities/synthetic.py
+"""
+import json
+import os
+import random
+import time
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'synthetic')
+
+WORDS = (
+    'рынок акции нефть рубль доллар индекс биржа инвесторы ставка банк '
+    'инфляция прогноз отчет компания рост снижение торги фьючерсы золото '
+    'облигации доходность экономика санкции дивиденды квартал выручка'
+).split()
+
+ARTICLE_DIV_CLASS = 'article_WYSIWYG__O0uhw article_articlePage__UMz3q text-[18px] leading-8'
+
+
+def sentence(rnd: random.Random, words=12) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def iso_time(ts) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+
+
+def news_list(rnd: random.Random, count, first_id=2670000, start_ts=1700000000) -> list:
+    return [
+        {
+            'article_ID': first_id + count - index,
+            'title': sentence(rnd, 8),
+            'href': f'/news/world-news/article-{first_id + count - index}',
+            'date': iso_time(start_ts + (count - index) * 300),
+            'provider_name': 'Investing.com',
+        }
+        for index in range(count)
+    ]
+
+
+def investing_listing_page(items: list, padding_kb=0, seed=0) -> str:
+    """Страница списка новостей с __NEXT_DATA__, как у Next.js."""
+    rnd = random.Random(seed)
+    # остальное состояние страницы: котировки, меню и т.п.
+    filler = [
+        {'id': i, 'name': sentence(rnd, 3), 'last': rnd.random() * 1000}
+        for i in range(padding_kb * 1024 // 80)
+    ]
+    next_data = {
+        'props': {
+            'pageProps': {
+                'state': {
+                    'quotesStore': {'quotes': filler},
+                    'newsStore': {
+                        '_breakingNewsList': items[:3],
+                        '_mostPopularNewsList': items,
+                    },
+                },
+            },
+        },
+        'page': '/news/[category]',
+        'buildId': 'synthetic',
+    }
+    links = '\n'.join(
+        f'<li><article><div><a href="{item["href"]}">{item["title"]}</a></div></article></li>'
+        for item in items
+    )
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">'
+        '<title>Самые популярные новости</title></head><body>'
+        f'<div id="__next"><div><div><div><div><div><div><ul>{links}</ul>'
+        '</div></div></div></div></div></div></div>'
+        '<script id="__NEXT_DATA__" type="application/json">'
+        f'{json.dumps(next_data, ensure_ascii=False)}</script>'
+        '</body></html>'
+    )
+
+
+def investing_article_page(article_id, paragraphs=20, seed=0) -> str:
+    """Страница статьи с блоком #article и служебными абзацами вокруг текста."""
+    rnd = random.Random(seed or article_id)
+    body = ''.join(f'<p>{sentence(rnd, 30)}</p>' for _ in range(paragraphs))
+    return (
+        '<!DOCTYPE html><html lang="ru"><head><meta charset="utf-8">'
+        f'<title>Статья {article_id}</title></head><body>'
+        '<div id="article"><div>'
+        f'<div class="{ARTICLE_DIV_CLASS}">'
+        '<p>Позиция успешно добавлена:</p>'
+        f'<p>Investing.com - {sentence(rnd, 20)}</p>'
+        f'{body}'
+        f'<blockquote>{sentence(rnd, 15)}</blockquote>'
+        '<p>Читайте оригинальную статью на сайте Investing.com</p>'
+        '</div></div></div></body></html>'
+    )
+
+
+def rbc_listing_page(items: list) -> str:
+    """Страница раздела РБК с блоками новостей."""
+    blocks = ''.join(
+        '<div class="item js-rm-central-column-item item_big item_with-photo js-index-exclude" '
+        f'data-id="{item["article_ID"]}">'
+        f'<a class="item__link rm-cm-item-link js-rm-central-column-item-link" href="https://www.rbc.ru{item["href"]}">'
+        f'<span class="item__title rm-cm-item-text js-rm-central-column-item-text">{item["title"]}</span>'
+        '</a></div>'
+        for item in items
+    )
+    return f'<!DOCTYPE html><html lang="ru"><body>{blocks}</body></html>'
+
+
+def write_fixtures(directory=FIXTURES_DIR):
+    os.makedirs(directory, exist_ok=True)
+    rnd = random.Random(42)
+    items = news_list(rnd, 30)
+    pages = {
+        'listing_investing.html': investing_listing_page(items, padding_kb=256),
+        'listing_rbc.html': rbc_listing_page(items),
+        'article_investing.html': investing_article_page(items[0]['article_ID']),
+        'article_investing_long.html': investing_article_page(items[1]['article_ID'], paragraphs=80),
+    }
+    for name, page in pages.items():
+        with open(os.path.join(directory, name), 'w', encoding='utf-8') as file:
+            file.write(page)
+        print(f'{name}: {len(page.encode()) // 1024} KB')
+
+
+if __name__ == '__main__':
+    write_fixtures()